@@ -3,16 +3,15 @@
 Question-Answering Evaluation Script with Command-line Arguments
 """
 
-import os
 import logging
 import argparse
 import json
-from tqdm import tqdm
-from datasets import load_dataset
-from together import Together
-from normalizer import normalize
-from evaluate import load as load_metric
-from utils import generate_content_together
+from checkpoint import RequestLog
+from data import load_split, LazyColumn
+from functools import lru_cache
+from scoring import score_squad_v2
+from tasks import Task, register_task, evaluate
+from utils import GenerationProfile, generate_all, add_generation_args, generation_options
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,6 +25,16 @@ Respond with a JSON object with the following keys:
 "answer" ('হ্যাঁ' or 'না' for yes-no questions)/substring of the context for single-span/list of substrings of the multiple-span/'<NOT_IN_CONTEXT>')
 """
 
+# System prompt for answering every question about one context in a single request
+llama3system_packed = """The user will provide a context and a numbered list of questions, all in Bengali. Read the context and the questions carefully.
+Respond with a JSON array that contains one JSON object per question, in the same order as the questions. Each object has the following keys:
+
+"question_number" (the number of the question in the list)
+"answerable" (boolean, Is the question answerable from the context?)
+"question_type" (yes-no / single-span / multiple-span)
+"answer" ('হ্যাঁ' or 'না' for yes-no questions)/substring of the context for single-span/list of substrings of the multiple-span/'<NOT_IN_CONTEXT>')
+"""
+
 def map_type(example):
     type_map = {
         "causal": "single-span",
@@ -49,72 +58,144 @@ def extract_json(response):
             "answer": "<NOT_IN_CONTEXT>"
         }
 
-def evaluate_responses(dataset, answers):
+def json_object_end(response):
+    """End of the first JSON object, matching how extract_json reads up to the first closing brace."""
+    start = response.find("{")
+    end = response.find("}", start + 1) if start != -1 else -1
+    return end + 1 if end != -1 else None
+
+def extract_json_array(response, num_questions):
+    """Split a packed response into one JSON string per question, with None for questions that did not parse."""
+    try:
+        items = json.loads("[" + response.split("[", 1)[1].rsplit("]", 1)[0] + "]")
+    except Exception as e:
+        logging.warning(f"Failed to extract JSON array: {e}")
+        return [None] * num_questions
+
+    answers = [None] * num_questions
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or "answerable" not in item or "answer" not in item:
+            continue
+        number = item.get("question_number", position + 1)
+        index = number - 1 if isinstance(number, int) and 1 <= number <= num_questions else position
+        if index < num_questions and answers[index] is None:
+            answers[index] = json.dumps(item, ensure_ascii=False)
+    return answers
+
+# The same answers and predictions recur many times, so normalize each string once
+@lru_cache(maxsize=None)
+def normalize_cached(text):
+    from normalizer import normalize
+    return normalize(text)
+
+def evaluate_responses(test_data, answers):
     predictions = []
+    no_answer_probabilities = []
     references = []
-    
-    for i in range(len(dataset["test"])):
-        data = dataset["test"][i]["answers"]
-        data["text"] = [normalize(x) for x in data["answer_text"]]
-        data["answer_start"] = list(range(len(data["text"])))
-
-        if int(dataset["test"][i]["is_answerable"]) == 0:
-            data["text"] = []
-            data["answer_start"] = []
 
-        del data["answer_text"]
-        del data["answer_type"]
+    for data, is_answerable in zip(test_data["answers"], test_data["is_answerable"]):
+        if int(is_answerable) == 0:
+            references.append([])
+        else:
+            references.append([normalize_cached(x) for x in data["answer_text"]])
 
-        references.append({
-            "answers": data,
-            "id": str(i)
-        })
-
-        answer_data = answers[i]
+    for answer_data in answers:
         a1 = answer_data["answerable"]
         a2 = answer_data["answer"]
         if isinstance(a2, list):
             a2 = "; ".join([x.strip() for x in a2 if x.strip() != "ইত্যাদি"])
 
-        predictions.append({
-            "prediction_text": normalize(a2) if a1 else "",
-            "id": str(i),
-            "no_answer_probability": 0.0 if a1 else 1.0
-        })
-    
-    squad_v2_metric = load_metric("squad_v2")
-    return squad_v2_metric.compute(predictions=predictions, references=references)
-
-def main(api_key, model_name):
-    os.environ["TOGETHER_API_KEY"] = api_key
-    client = Together(api_key=api_key)
+        predictions.append(normalize_cached(str(a2)) if a1 else "")
+        no_answer_probabilities.append(0.0 if a1 else 1.0)
 
-    dataset = load_dataset("sartajekram/BanglaRQA")
-    dataset = dataset.map(map_type)
+    return score_squad_v2(predictions, references, no_answer_probabilities)
 
+@register_task
+class QnATask(Task):
+    name = "qna"
+    instruct_prompt = llama3system
+    services = ("together", "local")
+    desc = "Generating answers"
     template = "Context:\n\n{}\n\nQuestion:\n\n{}"
-    answers = []
-
-    for data in tqdm(dataset["test"], desc="Generating answers"):
-        input_text = template.format(data["context"], data["question_text"])
-        response = generate_content_together(client, llama3system, input_text, model_name)
-
-        try:
-            extracted_response = extract_json(response)
-        except Exception:
-            logging.warning(f"Retrying failed response: {response}")
-            response = generate_content_together(client, llama3system, input_text, model_name)
-            extracted_response = extract_json(response)
-
-        answers.append(extracted_response)
-
-    results = evaluate_responses(dataset, answers)
-    logging.info(f"Evaluation results: {results}")
+    # extract_json only reads up to the first closing brace, so nothing after it is needed
+    profile = GenerationProfile(max_tokens=256, stop=["}"], complete=json_object_end)
+    # Answers may be lists, so a packed response is only complete at its final bracket
+    packed_profile = GenerationProfile(max_tokens=2048)
+
+    dataset = ("sartajekram/BanglaRQA", None, "test")
+
+    def load(self, model_name, dataset_range=None):
+        test_data = load_split(*self.dataset, limit=dataset_range)
+        return test_data.map(map_type)
+
+    packed_template = "Context:\n\n{}\n\nQuestions:\n\n{}"
+
+    def __init__(self, pack_contexts=False):
+        self.pack_contexts = pack_contexts
+
+    def inputs(self, test_data):
+        return LazyColumn(test_data, ["context", "question_text"], self.template.format)
+
+    def generate(self, service_choice, client, model_name, test_data, checkpoint=None, **generation_kwargs):
+        if not self.pack_contexts:
+            return super().generate(service_choice, client, model_name, test_data, checkpoint=checkpoint, **generation_kwargs)
+
+        # Group the questions that are still missing a response by their (identical) context
+        responses = checkpoint.responses() if checkpoint is not None else {}
+        groups = {}
+        for i, (context, question) in enumerate(zip(test_data["context"], test_data["question_text"])):
+            if i not in responses:
+                groups.setdefault(context, []).append((i, question))
+        contexts = list(groups)
+
+        packed_inputs = [
+            self.packed_template.format(context, "\n".join(f"{n}. {question}" for n, (_, question) in enumerate(groups[context], 1)))
+            for context in contexts
+        ]
+
+        def answer(i, response):
+            responses[i] = response
+            if checkpoint is not None:
+                checkpoint.record(i, response=response)
+
+        # Each question is logged as soon as the packed response holding its answer arrives
+        fallback = []
+        def unpack(position, packed_response):
+            context = contexts[position]
+            questions = groups[context]
+            for (i, question), response in zip(questions, extract_json_array(packed_response, len(questions))):
+                if response is None:
+                    fallback.append((i, self.template.format(context, question)))
+                else:
+                    answer(i, response)
+
+        generate_all(service_choice, client, llama3system_packed, packed_inputs, model_name, profile=self.packed_profile,
+                     checkpoint=RequestLog(unpack), desc="Generating packed answers", **generation_kwargs)
+        logging.info(f"Packed {sum(len(questions) for questions in groups.values())} questions into {len(contexts)} requests; "
+                     f"{len(fallback)} questions fall back to single requests.")
+
+        generate_all(service_choice, client, self.instruct_prompt, [input_text for _, input_text in fallback], model_name,
+                     profile=self.profile, checkpoint=RequestLog(lambda position, response: answer(fallback[position][0], response)),
+                     desc=self.desc, **generation_kwargs)
+        return [responses[i] for i in range(len(test_data))]
+
+    def score(self, test_data, responses):
+        answers = [extract_json(response) for response in responses]
+        results = evaluate_responses(test_data, answers)
+        exact_scores = results.pop("exact_scores")
+        f1_scores = results.pop("f1_scores")
+        return results, {"parsed": answers, "score": f1_scores, "exact": exact_scores}
+
+def main(api_key, model_name, pack_contexts=False, service_choice="together", **generation_kwargs):
+    return evaluate(QnATask(pack_contexts), api_key, service_choice, model_name, **generation_kwargs)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Evaluate Bengali question-answering models using Together API.")
     parser.add_argument("api_key", type=str, help="API key for Together API")
     parser.add_argument("model_name", type=str, help="Model name for Together API")
+    parser.add_argument("--pack-contexts", action="store_true", help="Ask all questions about the same context in one request")
+    parser.add_argument("--service", choices=["together", "local"], default="together", help="Together API or a Hugging Face model run on CPU")
+    add_generation_args(parser)
     args = parser.parse_args()
 
-    main(args.api_key, args.model_name)
+    main(args.api_key, args.model_name, args.pack_contexts, args.service, **generation_options(args))
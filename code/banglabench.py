@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+BanglaBench sweep runner: evaluate several tasks and models in one process
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from checkpoint import CheckpointLog
+from shards import shard_suffix
+from tasks import load_all_tasks, run_task
+from utils import create_client, add_generation_args, generation_options
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+API_KEY_ENV = {"together": "TOGETHER_API_KEY", "cohere": "CO_API_KEY"}
+
+class DatasetPool:
+    """Loads each task's test split once and shares it between all models of a sweep."""
+
+    def __init__(self):
+        self.datasets = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get(self, task, model_name, dataset_range):
+        key = (task.dataset_key(model_name), dataset_range)
+        with self.lock:
+            key_lock = self.locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self.datasets:
+                self.datasets[key] = task.load(model_name, dataset_range)
+                logging.info(f"Loaded dataset for task '{task.name}'.")
+            return self.datasets[key]
+
+def load_spec(path):
+    """Read a sweep spec, e.g.
+
+        {"tasks": ["translation", "inference"],
+         "models": [{"service": "together", "model": "meta-llama/Meta-Llama-3-70B-Instruct-Turbo"},
+                    {"service": "cohere", "model": "c4ai-aya-expanse-32b"}],
+         "dataset_range": {"inference": 1000}}
+
+    `dataset_range` is optional and is either one limit for every task or a per-task mapping.
+    `task_options` optionally maps task names to keyword arguments for the task, e.g.
+    {"qna": {"pack_contexts": true}}.
+    """
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def sweep_jobs(spec, tasks):
+    jobs = []
+    for task_name in spec["tasks"]:
+        if task_name not in tasks:
+            raise ValueError(f"Unknown task '{task_name}'. Available tasks: {', '.join(sorted(tasks))}")
+        dataset_range = spec.get("dataset_range")
+        if isinstance(dataset_range, dict):
+            dataset_range = dataset_range.get(task_name)
+        for model in spec["models"]:
+            if model["service"] not in tasks[task_name].services:
+                logging.warning(f"Skipping task '{task_name}' for {model['service']} model '{model['model']}': service not supported.")
+                continue
+            jobs.append({"task": task_name, "service": model["service"], "model": model["model"], "dataset_range": dataset_range})
+    return jobs
+
+def checkpoint_path(checkpoint_dir, job, shard=None):
+    model = re.sub(r"[^\w.-]+", "_", job["model"])
+    suffix = shard_suffix(shard) if shard else ""
+    return os.path.join(checkpoint_dir, f"{job['task']}__{job['service']}__{model}{suffix}.jsonl")
+
+def run_sweep(spec, checkpoint_dir=None, resume=False, **generation_kwargs):
+    """Run every (task, model) pair of a sweep and return one result record per pair.
+
+    Jobs are grouped into one lane per service and the lanes run concurrently, so a
+    Together-bound job and a Cohere-bound job are in flight at the same time. Provider
+    clients and loaded datasets are created once and shared by all jobs.
+    """
+    tasks = dict(load_all_tasks())
+    for task_name, options in spec.get("task_options", {}).items():
+        tasks[task_name] = type(tasks[task_name])(**options)
+    jobs = sweep_jobs(spec, tasks)
+    services = sorted({job["service"] for job in jobs})
+    clients = {service: create_client(service, os.environ[API_KEY_ENV[service]] if service in API_KEY_ENV else None)
+               for service in services}
+    datasets = DatasetPool()
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def run_job(job):
+        task = tasks[job["task"]]
+        test_data = datasets.get(task, job["model"], job["dataset_range"])
+        shard = (generation_kwargs.get("shard") or {}).get("shard")
+        merging = (generation_kwargs.get("shard") or {}).get("merge")
+        checkpoint = (CheckpointLog(checkpoint_path(checkpoint_dir, job, shard), resume=resume)
+                      if checkpoint_dir and not merging else None)
+        logging.info(f"Running task '{job['task']}' with {job['service']} model '{job['model']}'.")
+        return run_task(task, job["service"], clients[job["service"]], job["model"], test_data,
+                        checkpoint=checkpoint, **generation_kwargs)
+
+    def run_lane(lane):
+        results = []
+        for job in lane:
+            try:
+                metrics = run_job(job)
+                results.append({**job, "metrics": metrics})
+            except Exception as e:
+                logging.exception(f"Task '{job['task']}' failed for {job['service']} model '{job['model']}'.")
+                results.append({**job, "error": str(e)})
+        return results
+
+    lanes = [[job for job in jobs if job["service"] == service] for service in services]
+    with ThreadPoolExecutor(max_workers=max(1, len(lanes))) as executor:
+        lane_results = list(executor.map(run_lane, lanes))
+    return [result for results in lane_results for result in results]
+
+def estimate_sweep(spec, prices=None):
+    """Tokens and cost of every job of a sweep from the token index, without loading any dataset."""
+    from preprocessing import UPPER_LIMIT
+    from token_index import TokenIndex, estimate
+    tasks = load_all_tasks()
+    estimates = []
+    for job in sweep_jobs(spec, tasks):
+        index = TokenIndex.open(job["model"])
+        try:
+            result = estimate(index, tasks[job["task"]], job["dataset_range"], UPPER_LIMIT, job["model"], prices)
+        except KeyError:
+            logging.warning(f"No token counts for task '{job['task']}' and model '{job['model']}'; "
+                            f"run `python token_index.py build --tokenizers {job['model']}` first.")
+            continue
+        logging.info(f"{job['task']} with {job['service']} model '{job['model']}': {result['prompt_tokens']} prompt tokens, "
+                     f"~{result['completion_tokens']} completion tokens, cost {result.get('prompt_cost')} + {result.get('completion_cost')}")
+        estimates.append({**job, **result})
+    return estimates
+
+def main():
+    parser = argparse.ArgumentParser(description="Run BanglaBench tasks over several models in one process.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run a sweep spec (JSON) of tasks and models")
+    run_parser.add_argument("spec", type=str, help="Path to the sweep spec")
+    run_parser.add_argument("--output", type=str, default=None, help="Write the results of every job to this JSON file")
+    run_parser.add_argument("--checkpoint-dir", type=str, default=None, help="Directory for one checkpoint log per job")
+    run_parser.add_argument("--resume", action="store_true", help="Skip samples already completed in the checkpoint logs")
+    add_generation_args(run_parser, checkpoint=False)
+
+    estimate_parser = subparsers.add_parser("estimate", help="Tokens and cost of a sweep spec from the token index")
+    estimate_parser.add_argument("spec", type=str, help="Path to the sweep spec")
+    estimate_parser.add_argument("--prices", type=str, default=None, help="JSON file mapping model names to input/output dollars per million tokens")
+    estimate_parser.add_argument("--output", type=str, default=None, help="Write the estimates to this JSON file")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        options = generation_options(args)
+        results = run_sweep(load_spec(args.spec), checkpoint_dir=args.checkpoint_dir, resume=args.resume, **options)
+        if options["telemetry"] is not None:
+            options["telemetry"].export()
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            logging.info(f"Results written to {args.output}")
+    elif args.command == "estimate":
+        prices = None
+        if args.prices:
+            with open(args.prices, encoding="utf-8") as f:
+                prices = json.load(f)
+        estimates = estimate_sweep(load_spec(args.spec), prices)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(estimates, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Provider batch jobs: serialize a task's prompts, submit them as one job and ingest the results
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from utils import generate_all, request_params
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+FINISHED = ("COMPLETED", "FAILED", "EXPIRED", "CANCELLED")
+FILE_RETRIES = 3
+
+def batch_records(instruct_prompt, inputs, model_name, profile=None):
+    """One chat-completions request per (index, input) pair, keyed by the index."""
+    params = profile.params() if profile is not None else {}
+    for i, input_text in inputs:
+        yield {
+            "custom_id": str(i),
+            "body": {
+                "model": model_name,
+                "messages": [
+                    {"role": "system", "content": instruct_prompt},
+                    {"role": "user", "content": input_text},
+                ],
+                **params,
+            },
+        }
+
+def write_batch_file(directory, records):
+    """Write the requests to <directory>/<sha256 of the requests>.jsonl, so an identical batch maps to the same file."""
+    lines = [json.dumps(record, ensure_ascii=False) + "\n" for record in records]
+    digest = hashlib.sha256("".join(lines).encode("utf-8")).hexdigest()[:16]
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"batch-{digest}.jsonl")
+    if not os.path.exists(path):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(path + ".tmp", path)
+    return path
+
+def submit_batch(client, path):
+    """Upload the batch file and start a job on it, remembering the job id next to the file."""
+    state_path = path + ".job"
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            job_id = f.read().strip()
+        job = client.batches.retrieve(job_id)
+        if job.status in ("FAILED", "EXPIRED", "CANCELLED"):
+            logging.warning(f"Batch job {job_id} for {path} is {job.status}; submitting a new one.")
+        else:
+            logging.info(f"Resuming batch job {job_id} for {path}.")
+            return job_id
+
+    uploaded = client.files.upload(path, purpose="batch-api")
+    job = client.batches.create(endpoint=BATCH_ENDPOINT, input_file_id=uploaded.id).job
+    with open(state_path, "w", encoding="utf-8") as f:
+        f.write(job.id)
+    logging.info(f"Submitted batch job {job.id} for {path}.")
+    return job.id
+
+def wait_for_batch(client, job_id, poll_interval=30, timeout=None):
+    start = time.monotonic()
+    while True:
+        job = client.batches.retrieve(job_id)
+        if job.status in FINISHED:
+            logging.info(f"Batch job {job_id} finished with status {job.status}.")
+            return job
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise TimeoutError(f"Batch job {job_id} still {job.status} after {timeout} seconds")
+        logging.info(f"Batch job {job_id} is {job.status} ({job.progress or 0:.0f}% done).")
+        time.sleep(poll_interval)
+
+def read_batch_output(client, job):
+    """Return {index: (text, usage)} for every request of the job that succeeded."""
+    results = {}
+    if not job.output_file_id:
+        return results
+    content = client.files.content(job.output_file_id).read().decode("utf-8")
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code", 200) != 200:
+            continue
+        body = response["body"]
+        usage = body.get("usage") or {}
+        results[int(record["custom_id"])] = (body["choices"][0]["message"]["content"], {
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+        })
+    return results
+
+def generate_batch(service_choice, client, instruct_prompt, inputs, model_name, profile=None, cache=None,
+                   checkpoint=None, telemetry=None, directory="batches", poll_interval=30, timeout=None,
+                   desc="Generating", **kwargs):
+    """Batch-job counterpart of `utils.generate_all`, returning responses in input order.
+
+    Inputs already in the checkpoint or the cache are not submitted. The job id is kept
+    next to the batch file, so rerunning the same command after an interruption polls the
+    running job instead of submitting a new one. Requests that fail inside the job are
+    sent again through `utils.generate_all` with the other keyword arguments (concurrency,
+    rate, rpm, tpm, max_retries), so they get the normal limits and retries.
+    """
+    if service_choice != "together":
+        raise ValueError(f"Batch jobs are not supported for {service_choice}; use the synchronous mode.")
+
+    params = request_params(profile, False)
+    done = checkpoint.responses() if checkpoint is not None else {}
+    responses, pending = {}, []
+    for i, input_text in enumerate(inputs):
+        if i in done:
+            responses[i] = done[i]
+            continue
+        if cache is not None:
+            response = cache.get(cache.make_key(service_choice, model_name, instruct_prompt, input_text, params))
+            if response is not None:
+                if telemetry is not None:
+                    telemetry.record(service_choice, model_name, instruct_prompt + "\n\n" + input_text, response, cached=True)
+                responses[i] = response
+                if checkpoint is not None:
+                    checkpoint.record(i, response=response)
+                continue
+        pending.append((i, input_text))
+    logging.info(f"{desc}: {len(responses)} responses reused, {len(pending)} submitted as a batch job.")
+
+    if pending:
+        # Clients are created without SDK retries for the scheduler; file and job calls keep them
+        jobs_client = client.with_options(max_retries=FILE_RETRIES)
+        path = write_batch_file(directory, batch_records(instruct_prompt, pending, model_name, profile))
+        job = wait_for_batch(jobs_client, submit_batch(jobs_client, path), poll_interval, timeout)
+        results = read_batch_output(jobs_client, job)
+
+        failed = []
+        for i, input_text in pending:
+            if i not in results:
+                failed.append((i, input_text))
+                continue
+            response, usage = results[i]
+            responses[i] = response
+            if telemetry is not None:
+                telemetry.record(service_choice, model_name, instruct_prompt + "\n\n" + input_text, response, **usage)
+            if cache is not None:
+                cache.put(cache.make_key(service_choice, model_name, instruct_prompt, input_text, params), response)
+            if checkpoint is not None:
+                checkpoint.record(i, response=response)
+
+        if failed:
+            logging.warning(f"{len(failed)} requests failed in batch job {job.id}; retrying them as live requests.")
+            retried = generate_all(service_choice, client, instruct_prompt, [input_text for _, input_text in failed],
+                                   model_name, cache=cache, telemetry=telemetry, profile=profile,
+                                   desc=f"{desc} (batch failures)", **kwargs)
+            for (i, _), response in zip(failed, retried):
+                responses[i] = response
+                if checkpoint is not None:
+                    checkpoint.record(i, response=response)
+
+    return [responses[i] for i in sorted(responses)]
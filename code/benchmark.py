@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end throughput benchmark of the evaluation harness against the local mock provider
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+from mock_server import MockConfig, start_mock_server, base_urls
+from tasks import load_all_tasks
+from telemetry import Telemetry
+from utils import create_client
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BENGALI_WORDS = ["আমি", "তুমি", "সে", "বাংলা", "ভাষা", "দেশ", "মানুষ", "বই", "পড়া", "লেখা", "সুন্দর", "আজ", "কাল", "নদী", "গ্রাম", "শহর"]
+ENGLISH_WORDS = ["the", "people", "river", "village", "city", "book", "read", "write", "language", "country", "today", "beautiful"]
+
+def sentence(rng, words, length):
+    return " ".join(rng.choice(words) for _ in range(length))
+
+def synthetic_split(task_name, samples, seed=0):
+    """Build a test split with the columns a task reads, filled with random text."""
+    from datasets import Dataset
+    rng = random.Random(seed)
+    bn = lambda n: [sentence(rng, BENGALI_WORDS, n) for _ in range(samples)]
+    en = lambda n: [sentence(rng, ENGLISH_WORDS, n) for _ in range(samples)]
+    if task_name == "translation":
+        return Dataset.from_dict({"bn": bn(20), "en": en(20)})
+    if task_name == "paraphrase":
+        return Dataset.from_dict({"source": bn(20), "target": bn(20)})
+    if task_name == "inference":
+        return Dataset.from_dict({"sentence1": bn(20), "sentence2": bn(12), "label": [rng.randrange(3) for _ in range(samples)]})
+    if task_name == "crosslingual_summarization":
+        return Dataset.from_dict({"text": en(600), "summary": bn(25)})
+    if task_name == "monolingual_summarization":
+        return Dataset.from_dict({"text": bn(600), "summary": bn(25)})
+    if task_name == "qna":
+        answers = [{"answer_text": [sentence(rng, BENGALI_WORDS, 3)], "answer_type": ["single"]} for _ in range(samples)]
+        return Dataset.from_dict({
+            "context": bn(300),
+            "question_text": bn(10),
+            "question_type": ["factoid"] * samples,
+            "is_answerable": ["1"] * samples,
+            "answers": answers,
+        })
+    raise ValueError(f"No synthetic data for task '{task_name}'")
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def benchmark_task(task, service_choice, client, test_data, **generation_kwargs):
+    """Generate through the task's own dispatch (utils.generate_all) and score, timing both.
+
+    Request latencies are read from a Telemetry store that collects every provider call,
+    retries included, as in a real run.
+    """
+    telemetry = Telemetry()
+    start = time.perf_counter()
+    responses = task.generate(service_choice, client, "mock-model", test_data, telemetry=telemetry, **generation_kwargs)
+    generation_time = time.perf_counter() - start
+    latencies = [record["latency"] for record in telemetry.records
+                 if record["latency"] is not None and record["error"] is None]
+
+    start = time.perf_counter()
+    task.score(test_data, responses)
+    scoring_time = time.perf_counter() - start
+
+    return {
+        "task": task.name,
+        "service": service_choice,
+        "samples": len(responses),
+        "samples_per_sec": len(responses) / (generation_time + scoring_time),
+        "generation_time": generation_time,
+        "scoring_time": scoring_time,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p99": percentile(latencies, 99),
+    }
+
+def main(task_names, services, samples, config, output=None, **generation_kwargs):
+    """Benchmark every task and service; `generation_kwargs` (concurrency, rate, cache, ...) go to generate_all."""
+    tasks = load_all_tasks()
+    server, url = start_mock_server(config)
+    clients = {service: create_client(service, "mock-key", base_urls(url)[service]) for service in services}
+
+    results = []
+    try:
+        for task_name in task_names or sorted(tasks):
+            task = tasks[task_name]
+            test_data = synthetic_split(task_name, samples)
+            for service_choice in services:
+                if service_choice not in task.services:
+                    continue
+                try:
+                    result = benchmark_task(task, service_choice, clients[service_choice], test_data, **generation_kwargs)
+                except Exception:
+                    logging.exception(f"Benchmark failed for task '{task_name}' on {service_choice}.")
+                    continue
+                logging.info(
+                    f"{task_name} ({service_choice}): {result['samples_per_sec']:.1f} samples/sec, "
+                    f"p50 {result['latency_p50'] * 1000:.0f} ms, p99 {result['latency_p99'] * 1000:.0f} ms, "
+                    f"waiting {result['generation_time']:.2f}s, scoring {result['scoring_time']:.2f}s"
+                )
+                results.append(result)
+    finally:
+        server.shutdown()
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure harness throughput against a local mock provider.")
+    parser.add_argument("--tasks", nargs="+", default=None, help="Tasks to benchmark (default: all)")
+    parser.add_argument("--services", nargs="+", default=["together", "cohere"], choices=["together", "cohere"])
+    parser.add_argument("--samples", type=int, default=200, help="Synthetic samples per task")
+    parser.add_argument("--concurrency", type=int, default=None, help="Requests kept in flight (default depends on the service)")
+    parser.add_argument("--latency", type=float, default=0.1, help="Median mock latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5, help="Log-normal shape of the mock latency")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Additional mock seconds per generated word")
+    parser.add_argument("--stream", action="store_true", help="Stream responses and stop at each task's cut-off")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of mock requests answered with a 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of mock requests answered with a 429")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum requests per second, 0 to disable (default depends on the service)")
+    parser.add_argument("--rpm", type=int, default=None, help="Requests per minute allowed for the mock key")
+    parser.add_argument("--cache", type=str, default=None, help="Path to a SQLite response cache, to measure cached runs")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries of throttled or failed mock requests")
+    parser.add_argument("--output", type=str, default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency, args.jitter, args.error_rate, args.throttle_rate, seed=0, token_latency=args.token_latency)
+    cache = None
+    if args.cache:
+        from cache import ResponseCache
+        cache = ResponseCache(args.cache)
+    main(args.tasks, args.services, args.samples, config, args.output, concurrency=args.concurrency, rate=args.rate,
+         rpm=args.rpm, cache=cache, stream=args.stream, max_retries=args.max_retries)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent response cache for provider calls
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+class CacheMiss(KeyError):
+    """Raised in replay mode when a request is not in the cache."""
+
+class ResponseCache:
+    """SQLite-backed cache of model responses keyed by a hash of the full request.
+
+    Entries are evicted least-recently-used first once the stored responses exceed
+    `max_size` bytes. In `replay` mode every lookup must hit, so a finished run can be
+    rescored without any network calls.
+    """
+
+    def __init__(self, path, max_size=None, replay=False):
+        self.path = path
+        self.max_size = max_size
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(service, model_name, instruct_prompt, input_text, params=None):
+        payload = json.dumps(
+            [service, model_name, instruct_prompt, input_text, params or {}],
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                if self.replay:
+                    raise CacheMiss(key)
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key, response):
+        size = len(response.encode("utf-8"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            if self.max_size is not None:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_size:
+            return
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if total <= self.max_size:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "size": size}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def open_cache(args):
+    """Build a ResponseCache from the --cache/--cache-size/--replay command-line options."""
+    if not args.cache:
+        if args.replay:
+            raise ValueError("--replay requires --cache")
+        return None
+    max_size = int(args.cache_size * 1024 * 1024) if args.cache_size else None
+    return ResponseCache(args.cache, max_size=max_size, replay=args.replay)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Crash-safe per-sample checkpoint log for long evaluation runs
+"""
+
+import json
+import logging
+import os
+import threading
+
+class CheckpointLog:
+    """Append-only JSONL log of per-sample results.
+
+    Every line is a record with an "index" key; later records for the same index are
+    merged into earlier ones, so a sample can be logged once when its response arrives
+    and again once it has been parsed and scored. Lines are flushed as they are written
+    and the file is fsynced every `fsync_every` records.
+
+    A header line {"run": ...} identifies the run the log belongs to (see `start_run`), so
+    that a resumed log cannot hand its responses to a different task, model or slice.
+    """
+
+    def __init__(self, path, resume=False, fsync_every=50):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.run, self.records = self.load(path) if resume else (None, {})
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+        if resume and self.file.tell() > 0:
+            # Start on a fresh line in case the previous run died mid-write
+            self.file.write("\n")
+        if resume:
+            logging.info(f"Resuming from {path}: {len(self.completed())} samples already done.")
+
+    @staticmethod
+    def load(path):
+        """Return (run header, {index: record}) of an existing log."""
+        run, records = None, {}
+        if not os.path.exists(path):
+            return run, records
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write
+                    continue
+                if "run" in record:
+                    run = record["run"]
+                    continue
+                records.setdefault(record["index"], {}).update(record)
+        return run, records
+
+    def start_run(self, run):
+        """Write `run`, a JSON-serializable fingerprint of the run, as the log's header, or check it on resume.
+
+        Raises ValueError when a resumed log was written by a different run.
+        """
+        run = json.loads(json.dumps(run, ensure_ascii=False))
+        with self.lock:
+            if self.run is not None:
+                if self.run != run:
+                    changed = sorted(key for key in {**self.run, **run} if self.run.get(key) != run.get(key))
+                    raise ValueError(
+                        f"Checkpoint {self.path} belongs to a different run (differs in {', '.join(changed)}: "
+                        f"{ {key: self.run.get(key) for key in changed} } vs { {key: run.get(key) for key in changed} }); "
+                        f"use another --checkpoint or drop --resume."
+                    )
+                return
+            if self.records:
+                logging.warning(f"Checkpoint {self.path} has no run header; its responses are assumed to belong to this run.")
+            self.run = run
+            self.file.write(json.dumps({"run": run}, ensure_ascii=False) + "\n")
+            self.file.flush()
+
+    def completed(self):
+        """Indices whose raw response has already been logged."""
+        return {i for i, record in self.records.items() if "response" in record}
+
+    def responses(self):
+        return {i: record["response"] for i, record in self.records.items() if "response" in record}
+
+    def record(self, index, **fields):
+        record = {"index": index, **fields}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.records.setdefault(index, {}).update(record)
+            self.file.write(line)
+            self.file.flush()
+            self.pending += 1
+            if self.pending >= self.fsync_every:
+                os.fsync(self.file.fileno())
+                self.pending = 0
+
+    def record_all(self, **columns):
+        """Log one record per index from equal-length columns, e.g. parsed outputs and scores."""
+        for i, values in enumerate(zip(*columns.values())):
+            self.record(i, **dict(zip(columns, values)))
+
+    def close(self):
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+class RequestLog:
+    """Checkpoint for `utils.generate_all` calls whose requests are not dataset rows, e.g. packed QnA requests.
+
+    Every finished request is passed to `on_response(position, response)`, which records
+    the rows it answers in the real CheckpointLog.
+    """
+
+    def __init__(self, on_response):
+        self.on_response = on_response
+
+    def responses(self):
+        return {}
+
+    def record(self, position, response):
+        self.on_response(position, response)
+
+def open_checkpoint(args):
+    """Build a CheckpointLog from the --checkpoint/--resume command-line options, one log per --shard."""
+    if not args.checkpoint:
+        if args.resume:
+            raise ValueError("--resume requires --checkpoint")
+        return None
+    path = args.checkpoint
+    if getattr(args, "shard", None):
+        from shards import shard_suffix
+        path += shard_suffix(args.shard)
+    return CheckpointLog(path, resume=args.resume)
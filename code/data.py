@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Split-aware, lazy dataset access shared by the evaluation scripts
+"""
+
+import os
+
+def load_split(path, name=None, split="test", limit=None):
+    """Load a single split of a Hub dataset or a `save_to_disk` directory.
+
+    Only `split` (and only its first `limit` rows) is returned. Datasets stay memory-mapped
+    Arrow tables, so rows are read from disk when they are accessed rather than held in
+    memory.
+    """
+    from datasets import load_dataset, load_from_disk
+    if os.path.isdir(path):
+        dataset = load_from_disk(path, keep_in_memory=False)
+        if split in getattr(dataset, "keys", lambda: ())():
+            dataset = dataset[split]
+        return dataset.select(range(min(limit, len(dataset)))) if limit else dataset
+
+    split_spec = f"{split}[:{limit}]" if limit else split
+    return load_dataset(path, name, split=split_spec, keep_in_memory=False)
+
+class LazyColumn:
+    """Iterate over one or more columns of a dataset in batches without materializing them.
+
+    With several columns, or a `transform`, each item is `transform(*values)`; this is how
+    prompts built from more than one field are streamed into `utils.generate_all`.
+    """
+
+    def __init__(self, dataset, columns, transform=None, batch_size=1000):
+        self.dataset = dataset
+        self.columns = [columns] if isinstance(columns, str) else list(columns)
+        self.transform = transform
+        self.batch_size = batch_size
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __iter__(self):
+        if hasattr(self.dataset, "select_columns"):
+            dataset = self.dataset.select_columns(self.columns)
+        else:
+            dataset = self.dataset
+        for batch in dataset.iter(batch_size=self.batch_size):
+            for values in zip(*(batch[column] for column in self.columns)):
+                if self.transform is not None:
+                    yield self.transform(*values)
+                else:
+                    yield values[0] if len(values) == 1 else values
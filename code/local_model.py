@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Local CPU inference with Hugging Face models behind a dynamic batcher
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+class Request:
+    def __init__(self, input_ids, max_new_tokens, stop):
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.stop = stop
+        self.arrived = time.monotonic()
+        self.future = Future()
+
+class LocalModel:
+    """A causal LM or seq2seq model served by one background thread that batches concurrent requests.
+
+    Requests wait up to `max_wait` seconds for others to join them. A batch starts from the
+    oldest pending request and adds the pending requests closest to it in prompt length,
+    up to `max_batch_size` requests and `max_batch_tokens` padded prompt tokens, so little
+    compute is spent on padding.
+    """
+
+    def __init__(self, model_name, max_batch_size=8, max_batch_tokens=16384, max_wait=0.05, default_max_new_tokens=512):
+        import torch
+        from transformers import AutoConfig, AutoModelForCausalLM, AutoModelForSeq2SeqLM, AutoTokenizer
+
+        self.torch = torch
+        self.model_name = model_name
+        config = AutoConfig.from_pretrained(model_name)
+        self.seq2seq = bool(getattr(config, "is_encoder_decoder", False))
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, padding_side="right" if self.seq2seq else "left")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        model_class = AutoModelForSeq2SeqLM if self.seq2seq else AutoModelForCausalLM
+        self.model = model_class.from_pretrained(model_name)
+        self.model.eval()
+
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max_wait
+        self.default_max_new_tokens = default_max_new_tokens
+        self.pending = []
+        self.condition = threading.Condition()
+        self.counters = {"requests": 0, "batches": 0, "prompt_tokens": 0, "padded_prompt_tokens": 0,
+                         "completion_tokens": 0, "generation_time": 0.0}
+        threading.Thread(target=self.serve, daemon=True).start()
+        logging.info(f"Loaded local {'seq2seq' if self.seq2seq else 'causal'} model '{model_name}' on CPU.")
+
+    def format_prompt(self, instruct_prompt, input_text):
+        """Apply the chat template, folding the system prompt into the user turn for templates without a system role."""
+        if self.seq2seq or not self.tokenizer.chat_template:
+            return instruct_prompt + "\n\n" + input_text
+        messages = [{"role": "system", "content": instruct_prompt}, {"role": "user", "content": input_text}]
+        try:
+            return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        except Exception:
+            messages = [{"role": "user", "content": instruct_prompt + "\n\n" + input_text}]
+            return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+    def generate(self, instruct_prompt, input_text, max_new_tokens=None, stop=None):
+        """Return (text, usage) for one prompt; blocks until the batch it joins has been generated."""
+        prompt = self.format_prompt(instruct_prompt, input_text)
+        input_ids = self.tokenizer(prompt, add_special_tokens=self.seq2seq or not self.tokenizer.chat_template)["input_ids"]
+        request = Request(input_ids, max_new_tokens or self.default_max_new_tokens, tuple(stop or ()))
+        with self.condition:
+            self.pending.append(request)
+            self.condition.notify()
+        return request.future.result()
+
+    def take_batch(self):
+        oldest = self.pending[0]
+        candidates = sorted(
+            (r for r in self.pending if (r.max_new_tokens, r.stop) == (oldest.max_new_tokens, oldest.stop)),
+            key=lambda r: (abs(len(r.input_ids) - len(oldest.input_ids)), r.arrived)
+        )
+        batch, longest = [], 0
+        for request in candidates:
+            padded = max(longest, len(request.input_ids)) * (len(batch) + 1)
+            if batch and (len(batch) >= self.max_batch_size or padded > self.max_batch_tokens):
+                break
+            batch.append(request)
+            longest = max(longest, len(request.input_ids))
+        for request in batch:
+            self.pending.remove(request)
+        return batch
+
+    def serve(self):
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                deadline = self.pending[0].arrived + self.max_wait
+                while len(self.pending) < self.max_batch_size and time.monotonic() < deadline:
+                    self.condition.wait(deadline - time.monotonic())
+                batch = self.take_batch()
+            try:
+                results = self.run_batch(batch)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+
+    def run_batch(self, batch):
+        encoded = self.tokenizer.pad({"input_ids": [r.input_ids for r in batch]}, return_tensors="pt")
+        kwargs = {"max_new_tokens": batch[0].max_new_tokens, "do_sample": False, "pad_token_id": self.tokenizer.pad_token_id}
+        if batch[0].stop:
+            kwargs.update(stop_strings=list(batch[0].stop), tokenizer=self.tokenizer)
+
+        start = time.perf_counter()
+        with self.torch.no_grad():
+            output = self.model.generate(**encoded, **kwargs)
+        elapsed = time.perf_counter() - start
+        generated = output if self.seq2seq else output[:, encoded["input_ids"].shape[1]:]
+
+        results = []
+        special = set(self.tokenizer.all_special_ids)
+        for request, tokens in zip(batch, generated.tolist()):
+            completion_tokens = sum(1 for token in tokens if token not in special)
+            text = self.tokenizer.decode(tokens, skip_special_tokens=True).strip()
+            for sequence in request.stop:
+                if sequence in text:
+                    text = text[:text.index(sequence)]
+            results.append((text, {"prompt_tokens": len(request.input_ids), "completion_tokens": completion_tokens}))
+
+        self.counters["requests"] += len(batch)
+        self.counters["batches"] += 1
+        self.counters["prompt_tokens"] += sum(len(r.input_ids) for r in batch)
+        self.counters["padded_prompt_tokens"] += encoded["input_ids"].numel()
+        self.counters["completion_tokens"] += sum(usage["completion_tokens"] for _, usage in results)
+        self.counters["generation_time"] += elapsed
+        return results
+
+    def stats(self):
+        counters = dict(self.counters)
+        time_spent = counters["generation_time"] or None
+        counters["tokens_per_sec"] = counters["completion_tokens"] / time_spent if time_spent else None
+        counters["mean_batch_size"] = counters["requests"] / counters["batches"] if counters["batches"] else None
+        counters["padding_ratio"] = (1 - counters["prompt_tokens"] / counters["padded_prompt_tokens"]
+                                     if counters["padded_prompt_tokens"] else None)
+        return counters
+
+class LocalBackend:
+    """Client for the `local` service: loads each requested model once and routes requests to it."""
+
+    def __init__(self, **model_kwargs):
+        self.model_kwargs = model_kwargs
+        self.models = {}
+        self.lock = threading.Lock()
+
+    def model(self, model_name):
+        with self.lock:
+            if model_name not in self.models:
+                self.models[model_name] = LocalModel(model_name, **self.model_kwargs)
+            return self.models[model_name]
+
+    def generate(self, model_name, instruct_prompt, input_text, max_new_tokens=None, stop=None):
+        return self.model(model_name).generate(instruct_prompt, input_text, max_new_tokens, stop)
+
+    def stats(self, model_name):
+        """Generation counters of `model_name`, or None when it has not been loaded."""
+        model = self.models.get(model_name)
+        return model.stats() if model is not None else None
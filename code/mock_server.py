@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for the Together chat-completions, files and batches endpoints and the Cohere chat endpoint
+"""
+
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class MockConfig:
+    """Behaviour of the mock server.
+
+    Latency is log-normal around `latency` seconds with shape `jitter` (0 for a fixed
+    delay), plus `token_latency` seconds per generated word. A `throttle_rate` fraction of
+    requests get a 429 and an `error_rate` fraction a 500. Successful requests return
+    `response`, or echo the user message when it is None, cut to `max_tokens` words and at
+    the first stop sequence. Batch jobs finish `batch_latency` seconds after they are
+    created, with an `error_rate` fraction of their requests failed.
+    """
+
+    def __init__(self, latency=0.1, jitter=0.0, error_rate=0.0, throttle_rate=0.0, response=None, seed=None,
+                 token_latency=0.0, batch_latency=1.0):
+        self.latency = latency
+        self.batch_latency = batch_latency
+        self.token_latency = token_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.response = response
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample_latency(self):
+        with self.lock:
+            if self.jitter:
+                return self.latency * self.random.lognormvariate(0, self.jitter)
+            return self.latency
+
+    def sample_status(self):
+        with self.lock:
+            r = self.random.random()
+        if r < self.throttle_rate:
+            return 429
+        if r < self.throttle_rate + self.error_rate:
+            return 500
+        return 200
+
+def count_tokens(text):
+    return len(text.split())
+
+def apply_limits(text, max_tokens=None, stop=None):
+    for sequence in stop or []:
+        if sequence in text:
+            text = text[:text.index(sequence)]
+    if max_tokens is not None:
+        text = " ".join(text.split(" ")[:max_tokens])
+    return text
+
+def stream_pieces(text):
+    """Split text into word-sized pieces that join back into it."""
+    words = text.split(" ")
+    return [word + " " for word in words[:-1]] + words[-1:]
+
+def together_text(config, body):
+    user_text = body["messages"][-1]["content"] if body.get("messages") else ""
+    text = config.response if config.response is not None else user_text
+    return apply_limits(text, body.get("max_tokens"), body.get("stop"))
+
+def together_response(body, text):
+    prompt_tokens = sum(count_tokens(message["content"]) for message in body.get("messages", []))
+    completion_tokens = count_tokens(text)
+    return {
+        "id": str(uuid.uuid4()),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+def together_chunk(body, content=None, usage=None):
+    chunk = {
+        "id": "mock",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None if usage is None else "stop"}],
+    }
+    if usage is not None:
+        chunk["usage"] = usage
+    return chunk
+
+def cohere_response(body, text):
+    return {
+        "response_id": str(uuid.uuid4()),
+        "generation_id": str(uuid.uuid4()),
+        "text": text,
+        "finish_reason": "COMPLETE",
+        "meta": {
+            "api_version": {"version": "1"},
+            "billed_units": {"input_tokens": count_tokens(body.get("message", "")), "output_tokens": count_tokens(text)},
+        },
+    }
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # Clients drop kept-alive connections, e.g. after closing a stream early
+            pass
+
+    def do_POST(self):
+        config = self.server.config
+        path = self.path.rstrip("/")
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if path.endswith("/files"):
+            return self.start_upload()
+        if path.endswith("/preprocess"):
+            return self.send_json(200, self.server.batches.file_info(path.split("/")[-2]))
+        if path.endswith("/batches"):
+            job = self.server.batches.create(json.loads(data), config)
+            return self.send_json(200, {"job": job})
+
+        body = json.loads(data or b"{}")
+        time.sleep(config.sample_latency())
+
+        status = config.sample_status()
+        if status == 429:
+            return self.send_json(429, {"message": "Rate limit exceeded"}, {"Retry-After": "1"})
+        if status == 500:
+            return self.send_json(500, {"message": "Internal server error"})
+
+        if path.endswith("/chat/completions"):
+            text = together_text(config, body)
+            if body.get("stream"):
+                return self.stream_together(body, text)
+            time.sleep(config.token_latency * count_tokens(text))
+            return self.send_json(200, together_response(body, text))
+        if path.endswith("/chat"):
+            text = config.response if config.response is not None else body.get("message", "")
+            text = apply_limits(text, body.get("max_tokens"), body.get("stop_sequences"))
+            if body.get("stream"):
+                return self.stream_cohere(body, text)
+            time.sleep(config.token_latency * count_tokens(text))
+            return self.send_json(200, cohere_response(body, text))
+        return self.send_json(404, {"message": f"Unknown endpoint {self.path}"})
+
+    def start_upload(self):
+        """Answer a file upload with a redirect to a presigned-style URL on this server, like the Together API."""
+        file_id = f"file-{uuid.uuid4()}"
+        host, port = self.server.server_address[:2]
+        self.send_response(302)
+        self.send_header("Location", f"http://{host}:{port}/upload/{file_id}")
+        self.send_header("X-Together-File-Id", file_id)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_PUT(self):
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.batches.put_file(self.path.rstrip("/").split("/")[-1], data)
+        self.send_json(200, {})
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        parts = path.split("/")
+        if path.endswith("/content") and parts[-2] in self.server.batches.files:
+            data = self.server.batches.files[parts[-2]]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            return self.wfile.write(data)
+        if "/batches/" in path and parts[-1] in self.server.batches.jobs:
+            return self.send_json(200, self.server.batches.jobs[parts[-1]])
+        return self.send_json(404, {"message": f"Unknown endpoint {self.path}"})
+
+    def stream_together(self, body, text):
+        """Server-sent events in the OpenAI chunk format, ending with usage and [DONE]."""
+        events = [f"data: {json.dumps(together_chunk(body, piece), ensure_ascii=False)}\n\n" for piece in stream_pieces(text)]
+        usage = together_response(body, text)["usage"]
+        events.append(f"data: {json.dumps(together_chunk(body, usage=usage), ensure_ascii=False)}\n\n")
+        events.append("data: [DONE]\n\n")
+        self.send_stream("text/event-stream", events)
+
+    def stream_cohere(self, body, text):
+        """Newline-delimited JSON events in the Cohere chat stream format."""
+        events = [{"is_finished": False, "event_type": "stream-start", "generation_id": str(uuid.uuid4())}]
+        events += [{"is_finished": False, "event_type": "text-generation", "text": piece} for piece in stream_pieces(text)]
+        events.append({"is_finished": True, "event_type": "stream-end", "finish_reason": "COMPLETE", "response": cohere_response(body, text)})
+        self.send_stream("application/stream+json", [json.dumps(event, ensure_ascii=False) + "\n" for event in events])
+
+    def send_stream(self, content_type, events):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for event in events:
+                data = event.encode("utf-8")
+                self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+                time.sleep(self.server.config.token_latency)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early
+            self.close_connection = True
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class MockBatches:
+    """Uploaded files and batch jobs of the mock server, with jobs run in background threads."""
+
+    def __init__(self):
+        self.files = {}
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def put_file(self, file_id, data):
+        with self.lock:
+            self.files[file_id] = data
+
+    def file_info(self, file_id):
+        return {
+            "id": file_id,
+            "bytes": len(self.files.get(file_id, b"")),
+            "created_at": int(time.time()),
+            "filename": f"{file_id}.jsonl",
+            "FileType": "jsonl",
+            "object": "file",
+            "Processed": True,
+            "purpose": "batch-api",
+        }
+
+    def create(self, body, config):
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id,
+            "endpoint": body.get("endpoint"),
+            "input_file_id": body["input_file_id"],
+            "status": "IN_PROGRESS",
+            "progress": 0.0,
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+        threading.Thread(target=self.run, args=(job, config), daemon=True).start()
+        return dict(job)
+
+    def run(self, job, config):
+        time.sleep(config.batch_latency)
+        outputs, errors = [], []
+        for line in self.files[job["input_file_id"]].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if config.sample_status() != 200:
+                errors.append({"custom_id": request["custom_id"], "error": {"message": "Internal server error"}})
+                continue
+            body = request["body"]
+            response = together_response(body, together_text(config, body))
+            outputs.append({"custom_id": request["custom_id"], "response": {"status_code": 200, "body": response}})
+
+        output_file_id, error_file_id = f"file-{uuid.uuid4()}", f"file-{uuid.uuid4()}"
+        self.put_file(output_file_id, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in outputs).encode("utf-8"))
+        self.put_file(error_file_id, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in errors).encode("utf-8"))
+        with self.lock:
+            job.update(status="COMPLETED", progress=100.0, output_file_id=output_file_id, error_file_id=error_file_id)
+
+def start_mock_server(config, host="127.0.0.1", port=0):
+    """Serve in a background thread and return (server, base URL). Use port 0 for a free port."""
+    server = ThreadingHTTPServer((host, port), MockProviderHandler)
+    server.daemon_threads = True
+    server.config = config
+    server.batches = MockBatches()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def base_urls(server_url):
+    """Base URLs to pass to utils.create_client for each service."""
+    return {"together": f"{server_url}/v1", "cohere": server_url}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve mock Together and Cohere chat endpoints.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.1, help="Median response latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Log-normal shape of the latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Additional seconds per generated word")
+    parser.add_argument("--batch-latency", type=float, default=1.0, help="Seconds until a batch job completes")
+    parser.add_argument("--response", type=str, default=None, help="Canned response text (default: echo the input)")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency, args.jitter, args.error_rate, args.throttle_rate, args.response,
+                        token_latency=args.token_latency, batch_latency=args.batch_latency)
+    server, url = start_mock_server(config, args.host, args.port)
+    logging.info(f"Mock provider listening on {url} (Together: {base_urls(url)['together']}, Cohere: {base_urls(url)['cohere']})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -3,67 +3,56 @@
 Monolingual Summarization Evaluation Script with Command-line Arguments
 """
 
-import os
 import logging
 import argparse
-from datasets import load_dataset, load_from_disk
-from together import Together
-import cohere
-from tqdm import tqdm
-import time
-from rouge_score import rouge_scorer
-from utils import generate_content_together, generate_content_aya, extract_summary
+from data import LazyColumn
+from preprocessing import truncated_split
+from scoring import Rouge2References
+from sequential import add_sequential_args, sequential_options
+from tasks import Task, register_task, evaluate
+from utils import GenerationProfile, add_generation_args, generation_options, extract_summary, first_sentence_end
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 instruct_prompt = "Please write a one-sentence Bengali summary/TL;DR of the given Bengali article. The summary must not be longer than a sentence and must be in Bengali. Just return the summary without any preamble, quotations, or explanations."
 
-scorer = rouge_scorer.RougeScorer(['rouge2', ], use_stemmer=True, lang="bengali")
+@register_task
+class MonolingualSummarizationTask(Task):
+    name = "monolingual_summarization"
+    instruct_prompt = instruct_prompt
+    profile = GenerationProfile(max_tokens=256, complete=first_sentence_end)
+    dataset = ("csebuetnlp/xlsum", "bengali", "test")
+    reference_column = "summary"
+    truncation_column = "text"
 
-def main(api_key, service_choice, model_name, dataset_range):  
-    dataset = load_from_disk('truncated_xlsum')
-    logging.info("Dataset loaded successfully.")
+    def load(self, model_name, dataset_range=None):
+        path, name, split = self.dataset
+        test_data = truncated_split(path, name, split=split)
+        return test_data.select(range(dataset_range)) if dataset_range else test_data
 
-    rouge_scores = []
+    def inputs(self, test_data):
+        return LazyColumn(test_data, "text")
 
-    if service_choice == "together":
-        os.environ["TOGETHER_API_KEY"] = api_key
-        client = Together(api_key=api_key)
-        logging.info("Evaluating using Together API.")
-        for data in tqdm(dataset["test"].select(range(dataset_range))):
-            input_text = data["text"]
-            response = generate_content_together(client, instruct_prompt, input_text, model_name)
-            response = extract_summary(response)
-            target_text = data["summary"]
-            rouge = scorer.score(target_text, response)['rouge2'].fmeasure
-            rouge_scores.append(rouge)
+    def score(self, test_data, responses):
+        summaries = [extract_summary(response) for response in responses]
+        rouge_scores = Rouge2References(test_data["summary"]).score(summaries)
 
-    elif service_choice == "cohere":
-        client = cohere.Client(api_key)
-        logging.info("Evaluating using Cohere API.")
-        for data in tqdm(dataset["test"].select(range(dataset_range))):
-            input_text = data["text"]
-            response = generate_content_aya(client, instruct_prompt, input_text, model_name)
-            response = extract_summary(response)
-            target_text = data["summary"]
-            rouge = scorer.score(target_text, response)['rouge2'].fmeasure
-            rouge_scores.append(rouge)
-            time.sleep(1)  # To avoid rate limiting
+        avg_rouge_score = sum(rouge_scores) / len(rouge_scores)
+        return {"Average ROUGE-2 score": avg_rouge_score}, {"parsed": summaries, "score": rouge_scores}
 
-    else:
-        logging.error("Invalid service choice. Please choose 'together' or 'cohere'.")
-        return
-
-    avg_rouge_score = sum(rouge_scores) / len(rouge_scores)
-    logging.info(f"Average ROUGE-2 score for {service_choice} model '{model_name}': {avg_rouge_score}")
+def main(api_key, service_choice, model_name, dataset_range, **generation_kwargs):  
+    return evaluate(MonolingualSummarizationTask(), api_key, service_choice, model_name, dataset_range, **generation_kwargs)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Evaluate monolingual summarization models using Together or Cohere APIs.")
     parser.add_argument("api_key", type=str, help="API key for the chosen service")
-    parser.add_argument("service_choice", choices=["together", "cohere"], help="Service choice: 'together' or 'cohere'")
+    parser.add_argument("service_choice", choices=["together", "cohere", "local"], help="Service choice: 'together', 'cohere' or 'local' (a Hugging Face model run on CPU)")
     parser.add_argument("model_name", type=str, help="Model name for the chosen service")
     parser.add_argument("dataset_range", type=int, help="The number of dataset items to infer on (max 1012 items)")
+    add_generation_args(parser)
+    add_sequential_args(parser)
     args = parser.parse_args()
 
-    main(args.api_key, args.service_choice, args.model_name, args.dataset_range)
\ No newline at end of file
+    main(args.api_key, args.service_choice, args.model_name, args.dataset_range,
+         sequential=sequential_options(args), **generation_options(args))
\ No newline at end of file
@@ -1,29 +1,19 @@
 # -*- coding: utf-8 -*-
 """
-Dataset truncation Script with Command-line Arguments
+Dataset truncation Script: fills the truncation cache that evaluation.py reads
+Run from the code directory: python -m monolingual_summarization.truncation
 """
 
 import logging
-from datasets import load_dataset
-from transformers import AutoTokenizer
-import time
+from preprocessing import truncated_split, DEFAULT_TOKENIZER, UPPER_LIMIT
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-  
-tokenizer = AutoTokenizer.from_pretrained("NousResearch/Meta-Llama-3-8B")
-UPPER_LIMIT = 8000
-def truncate_long_articles(example):
-    tokens = tokenizer(example["text"])["input_ids"]
-    if len(tokens) > UPPER_LIMIT:
-        example["text"] = tokenizer.decode(tokens[:UPPER_LIMIT], skip_special_tokens = True)
-    return example
 
-def main():  
-    dataset = load_dataset("csebuetnlp/xlsum", 'bengali')
-    logging.info("Dataset loaded successfully.")
-    dataset["test"] = dataset["test"].map(truncate_long_articles)
-    dataset.save_to_disk("truncated_xlsum")
+def main():
+    # Same arguments as MonolingualSummarizationTask.load, so evaluation.py finds the cached split
+    test_data = truncated_split("csebuetnlp/xlsum", "bengali", split="test", tokenizer_name=DEFAULT_TOKENIZER, upper_limit=UPPER_LIMIT)
+    logging.info(f"Dataset truncated successfully: {len(test_data)} articles.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -3,63 +3,54 @@
 Paraphrasing Evaluation Script with Command-line Arguments
 """
 
-import os
 import logging
 import argparse
-from datasets import load_dataset
-from together import Together
-import cohere
-from tqdm import tqdm
-import sacrebleu
-import time
-from utils import generate_content_together, generate_content_aya, calculate_sacrebleu
+from data import load_split, LazyColumn
+from scoring import score_translations
+from sequential import add_sequential_args, sequential_options
+from tasks import Task, register_task, evaluate
+from utils import GenerationProfile, add_generation_args, generation_options
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 instruct_prompt = "You are a state-of-the-art AI assistant that generates Bengali paraphrases. The user provides you with a Bengali sentence, and your task is to generate a Bengali paraphrase of it. Just return the paraphrase without any preamble, quotations or explanations."
 
-def main(api_key, service_choice, model_name, dataset_range):  
-    dataset = load_dataset("csebuetnlp/BanglaParaphrase")
-    logging.info("Dataset loaded successfully.")
+@register_task
+class ParaphraseTask(Task):
+    name = "paraphrase"
+    instruct_prompt = instruct_prompt
+    profile = GenerationProfile(max_tokens=256)
+    dataset = ("csebuetnlp/BanglaParaphrase", None, "test")
+    reference_column = "target"
 
-    bleu_scores = []
+    def load(self, model_name, dataset_range=None):
+        return load_split(*self.dataset, limit=dataset_range)
 
-    if service_choice == "together":
-        os.environ["TOGETHER_API_KEY"] = api_key
-        client = Together(api_key=api_key)
-        logging.info("Evaluating using Together API.")
-        for data in tqdm(dataset["test"].select(range(dataset_range))):
-            input_text = data["source"]
-            response = generate_content_together(client, instruct_prompt, input_text, model_name)
-            target_text = data["target"]
-            sbleu = calculate_sacrebleu(target_text, response)
-            bleu_scores.append(sbleu)
+    def inputs(self, test_data):
+        return LazyColumn(test_data, "source")
 
-    elif service_choice == "cohere":
-        client = cohere.Client(api_key)
-        logging.info("Evaluating using Cohere API.")
-        for data in tqdm(dataset["test"].select(range(dataset_range))):
-            input_text = data["source"]
-            response = generate_content_aya(client, instruct_prompt, input_text, model_name)
-            target_text = data["target"]
-            sbleu = calculate_sacrebleu(target_text, response)
-            bleu_scores.append(sbleu)
-            time.sleep(1)  # To avoid rate limiting
+    def score(self, test_data, responses):
+        scores = score_translations(responses, test_data["target"])
+        metrics = {
+            "Average BLEU score": scores["mean_sentence_bleu"],
+            "Corpus BLEU score": scores["corpus_bleu"],
+            "chrF++ score": scores["chrf++"],
+        }
+        return metrics, {"parsed": responses, "score": scores["sentence_bleu"]}
 
-    else:
-        logging.error("Invalid service choice. Please choose 'together' or 'cohere'.")
-        return
-
-    avg_bleu_score = sum(bleu_scores) / len(bleu_scores)
-    logging.info(f"Average BLEU score for {service_choice} model '{model_name}': {avg_bleu_score}")
+def main(api_key, service_choice, model_name, dataset_range, **generation_kwargs):  
+    return evaluate(ParaphraseTask(), api_key, service_choice, model_name, dataset_range, **generation_kwargs)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Evaluate translation models using Together or Cohere APIs.")
     parser.add_argument("api_key", type=str, help="API key for the chosen service")
-    parser.add_argument("service_choice", choices=["together", "cohere"], help="Service choice: 'together' or 'cohere'")
+    parser.add_argument("service_choice", choices=["together", "cohere", "local"], help="Service choice: 'together', 'cohere' or 'local' (a Hugging Face model run on CPU)")
     parser.add_argument("model_name", type=str, help="Model name for the chosen service")
     parser.add_argument("dataset_range", type=int, help="The number of dataset items to infer on (max 23k items)")
+    add_generation_args(parser)
+    add_sequential_args(parser)
     args = parser.parse_args()
 
-    main(args.api_key, args.service_choice, args.model_name, args.dataset_range)
+    main(args.api_key, args.service_choice, args.model_name, args.dataset_range,
+         sequential=sequential_options(args), **generation_options(args))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Cached, batched article truncation shared by the summarization tasks
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from data import load_split
+
+DEFAULT_TOKENIZER = "NousResearch/Meta-Llama-3-8B"
+UPPER_LIMIT = 8000
+CACHE_DIR = os.path.expanduser(os.environ.get("BANGLABENCH_CACHE", "~/.cache/banglabench"))
+# Bump when the truncation logic changes so stale artifacts are not reused
+TRUNCATION_VERSION = 1
+
+def load_tokenizer(tokenizer_name):
+    """Load a fast tokenizer, falling back to DEFAULT_TOKENIZER for models without one on the Hub (e.g. Cohere)."""
+    from transformers import AutoTokenizer
+    try:
+        return AutoTokenizer.from_pretrained(tokenizer_name, use_fast=True), tokenizer_name
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not load tokenizer '{tokenizer_name}' ({e}); using '{DEFAULT_TOKENIZER}' instead.")
+        return AutoTokenizer.from_pretrained(DEFAULT_TOKENIZER, use_fast=True), DEFAULT_TOKENIZER
+
+def truncate_batch(batch, tokenizer, upper_limit=UPPER_LIMIT, column="text"):
+    # Cut the original string at the character offset of the last kept token instead of decoding the tokens
+    encodings = tokenizer(batch[column], return_offsets_mapping=True)
+    texts = []
+    for text, input_ids, offsets in zip(batch[column], encodings["input_ids"], encodings["offset_mapping"]):
+        if len(input_ids) > upper_limit:
+            text = text[:max(end for _, end in offsets[:upper_limit])]
+        texts.append(text)
+    return {column: texts}
+
+def truncate_long_rows(batch, indices, long_rows, tokenizer, upper_limit=UPPER_LIMIT, column="text"):
+    """truncate_batch for the rows in `long_rows`; the others are known to fit and are not tokenized."""
+    texts = list(batch[column])
+    positions = [position for position, index in enumerate(indices) if index in long_rows]
+    if positions:
+        cut = truncate_batch({column: [texts[position] for position in positions]}, tokenizer, upper_limit, column)[column]
+        for position, text in zip(positions, cut):
+            texts[position] = text
+    return {column: texts}
+
+def truncation_fingerprint(path, name, split, tokenizer_name, upper_limit):
+    payload = json.dumps([path, name, split, tokenizer_name, upper_limit, TRUNCATION_VERSION])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def truncated_split(path, name=None, split="test", tokenizer_name=DEFAULT_TOKENIZER, upper_limit=UPPER_LIMIT,
+                    num_proc=None, cache_dir=CACHE_DIR):
+    """Return `split` of a dataset with every article cut to at most `upper_limit` tokens.
+
+    The truncated split is saved under `cache_dir` keyed by (dataset, split, tokenizer,
+    upper_limit), so later runs, including runs for other models that share the
+    tokenizer, load it memory-mapped instead of re-tokenizing. When the token index
+    (token_index.py) has counts for the articles, only the articles that are too long
+    are tokenized.
+    """
+    from token_index import TokenIndex
+    index = TokenIndex.open(tokenizer_name, cache_dir)
+    tokenizer, tokenizer_name = load_tokenizer(tokenizer_name)
+    artifact = os.path.join(cache_dir, "truncated", truncation_fingerprint(path, name, split, tokenizer_name, upper_limit))
+    if os.path.isdir(artifact):
+        logging.info(f"Loading truncated {path} {split} split from {artifact}.")
+        return load_split(artifact)
+
+    dataset = load_split(path, name, split=split)
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    token_counts = index.column(path, name, split, "text") if index.resolved_tokenizer == tokenizer_name else None
+    if token_counts is not None and len(token_counts) == len(dataset):
+        long_rows = set((token_counts > upper_limit).nonzero()[0].tolist())
+        logging.info(f"Token index: {len(long_rows)} of {len(dataset)} articles are longer than {upper_limit} tokens.")
+        if long_rows:
+            dataset = dataset.map(
+                truncate_long_rows,
+                batched=True,
+                with_indices=True,
+                num_proc=num_proc or os.cpu_count(),
+                fn_kwargs={"long_rows": long_rows, "tokenizer": tokenizer, "upper_limit": upper_limit},
+                desc="Truncating long articles",
+            )
+    else:
+        dataset = dataset.map(
+            truncate_batch,
+            batched=True,
+            num_proc=num_proc or os.cpu_count(),
+            fn_kwargs={"tokenizer": tokenizer, "upper_limit": upper_limit},
+            desc="Truncating long articles",
+        )
+    # Write to a temporary directory first so concurrent runs never see a partial artifact
+    tmp_artifact = f"{artifact}.tmp-{os.getpid()}"
+    dataset.save_to_disk(tmp_artifact)
+    try:
+        os.rename(tmp_artifact, artifact)
+    except OSError:
+        # Another run finished first; keep its artifact
+        shutil.rmtree(tmp_artifact, ignore_errors=True)
+    logging.info(f"Saved truncated {path} {split} split to {artifact}.")
+    return load_split(artifact)
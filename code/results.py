@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Partitioned Parquet store of per-sample results, with leaderboard queries and rescoring
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+import uuid
+from urllib.parse import quote
+from tasks import prompt_hash
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+METADATA_KEY = b"banglabench"
+
+def encode_parsed(value):
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+def metric_value(metrics, name):
+    """The metric called `name`, ignoring case, or None when the run has no such metric."""
+    matches = {key.casefold(): value for key, value in metrics.items()}
+    return metrics[name] if name in metrics else matches.get(name.casefold())
+
+def run_table(indices, responses, columns, service, prompt_hash, timestamp, run_id):
+    """One row per sample: response, JSON-encoded parsed output, the score columns and run metadata."""
+    import pyarrow as pa
+    data = {"index": pa.array(indices, pa.int64()), "response": pa.array(responses, pa.string())}
+    for name, values in columns.items():
+        if name == "parsed":
+            data[name] = pa.array([encode_parsed(value) for value in values], pa.string())
+        else:
+            data[name] = pa.array([None if value is None else float(value) for value in values], pa.float64())
+    rows = len(indices)
+    data["service"] = pa.array([service] * rows, pa.string())
+    data["prompt_hash"] = pa.array([prompt_hash] * rows, pa.string())
+    data["timestamp"] = pa.array([timestamp] * rows, pa.float64())
+    data["run_id"] = pa.array([run_id] * rows, pa.string())
+    return pa.table(data)
+
+class ResultsStore:
+    """Per-sample results under <root>/task=<task>/model=<model>/<run_id>.parquet.
+
+    Each run is one Parquet file whose schema metadata holds the run-level metrics, so
+    runs can be listed and leaderboards built without reading the per-sample columns.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def run_path(self, task_name, model_name, run_id):
+        return os.path.join(self.root, f"task={quote(task_name, safe='')}", f"model={quote(model_name, safe='')}", f"{run_id}.parquet")
+
+    def write(self, task, service_choice, model_name, indices, responses, columns, metrics):
+        timestamp = time.time()
+        run_id = time.strftime("%Y%m%dT%H%M%S", time.gmtime(timestamp)) + "-" + uuid.uuid4().hex[:8]
+        table = run_table(indices, responses, columns, service_choice, prompt_hash(task), timestamp, run_id)
+        meta = {"task": task.name, "model": model_name, "service": service_choice, "run_id": run_id,
+                "timestamp": timestamp, "prompt_hash": prompt_hash(task), "samples": len(indices), "metrics": metrics}
+        path = self.run_path(task.name, model_name, run_id)
+        self.write_table(path, table, meta)
+        logging.info(f"Results written to {path}")
+        return path
+
+    @staticmethod
+    def write_table(path, table, meta):
+        import pyarrow.parquet as pq
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = table.replace_schema_metadata({METADATA_KEY: json.dumps(meta, ensure_ascii=False)})
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def run_files(self, task_name=None, model_name=None):
+        if not os.path.isdir(self.root):
+            return []
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            files.extend(os.path.join(dirpath, filename) for filename in filenames if filename.endswith(".parquet"))
+        runs = [(path, self.run_meta(path)) for path in sorted(files)]
+        return [(path, meta) for path, meta in runs
+                if (task_name is None or meta["task"] == task_name) and (model_name is None or meta["model"] == model_name)]
+
+    @staticmethod
+    def run_meta(path):
+        import pyarrow.parquet as pq
+        return json.loads(pq.read_schema(path).metadata[METADATA_KEY])
+
+    def runs(self, task_name=None, model_name=None):
+        return [meta for _, meta in self.run_files(task_name, model_name)]
+
+    def latest_runs(self, task_name=None, model_name=None):
+        latest = {}
+        for path, meta in self.run_files(task_name, model_name):
+            key = (meta["task"], meta["model"])
+            if key not in latest or meta["timestamp"] > latest[key][1]["timestamp"]:
+                latest[key] = (path, meta)
+        return latest
+
+    def dataset(self):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        partitioning = ds.partitioning(pa.schema([("task", pa.string()), ("model", pa.string())]), flavor="hive")
+        return ds.dataset(self.root, format="parquet", partitioning=partitioning)
+
+    def leaderboard(self, metric=None, column="score"):
+        """{(task, model): value} from the latest run of every pair.
+
+        With `metric`, the run-level metric of that name (case-insensitive) is used; otherwise
+        the mean of the per-sample `column` is aggregated from the store.
+        """
+        latest = self.latest_runs()
+        if metric is not None:
+            return {key: metric_value(meta["metrics"], metric) for key, (_, meta) in latest.items()}
+        import pyarrow.dataset as ds
+        run_ids = [meta["run_id"] for _, meta in latest.values()]
+        table = self.dataset().to_table(columns=["task", "model", "run_id", column], filter=ds.field("run_id").isin(run_ids))
+        means = table.group_by(["task", "model"]).aggregate([(column, "mean")])
+        return {(task, model): value for task, model, value in
+                zip(means["task"].to_pylist(), means["model"].to_pylist(), means[f"{column}_mean"].to_pylist())}
+
+    def rescore(self, task, columns=None, model_name=None):
+        """Recompute the parsed outputs and scores of stored runs from their responses, without regenerating.
+
+        Only `columns` (e.g. ["parsed", "score"]) are replaced, or every scored column when
+        None; the run-level metrics are updated as well. Aggregate metrics cannot be rebuilt
+        from per-sample columns, so `columns` must include every score column (all but
+        "parsed") for the stored scores to stay in step with the metrics.
+        """
+        import pyarrow.parquet as pq
+        rescored = []
+        for path, meta in self.run_files(task.name, model_name):
+            table = pq.read_table(path)
+            indices = table["index"].to_pylist()
+            responses = table["response"].to_pylist()
+            test_data = task.load(meta["model"], max(indices) + 1).select(indices)
+            metrics, new_columns = task.score(test_data, responses)
+
+            replaced = [name for name in new_columns if columns is None or name in columns]
+            stale = [name for name in new_columns if name != "parsed" and name not in replaced]
+            if stale:
+                raise ValueError(f"Rescoring {meta['task']} without {', '.join(stale)} would leave them out of step "
+                                 f"with the rescored metrics; add them to --columns")
+            new_table = run_table(indices, responses, {name: new_columns[name] for name in replaced},
+                                  meta["service"], meta["prompt_hash"], meta["timestamp"], meta["run_id"])
+            for name in replaced:
+                position = table.schema.get_field_index(name)
+                if position == -1:
+                    table = table.append_column(name, new_table[name])
+                else:
+                    table = table.set_column(position, name, new_table[name])
+            self.write_table(path, table, {**meta, "metrics": metrics, "rescored_at": time.time()})
+            logging.info(f"Rescored {', '.join(replaced)} of {meta['task']} run {meta['run_id']} for model '{meta['model']}'.")
+            rescored.append(path)
+        return rescored
+
+def open_results(args):
+    """Build a ResultsStore from the --results command-line option."""
+    return ResultsStore(args.results) if args.results else None
+
+def format_leaderboard(board):
+    tasks = sorted({task for task, _ in board})
+    models = sorted({model for _, model in board})
+    lines = ["| Model | " + " | ".join(tasks) + " |", "|---" * (len(tasks) + 1) + "|"]
+    for model in models:
+        values = [board.get((task, model)) for task in tasks]
+        lines.append(f"| {model} | " + " | ".join("" if value is None else f"{value:.4f}" for value in values) + " |")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and rescore the BanglaBench results store.")
+    parser.add_argument("--results", type=str, default="results", help="Root directory of the results store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    runs_parser = subparsers.add_parser("runs", help="List stored runs and their metrics")
+    runs_parser.add_argument("--task", type=str, default=None)
+    runs_parser.add_argument("--model", type=str, default=None)
+
+    board_parser = subparsers.add_parser("leaderboard", help="Model-by-task table of the latest run of every pair")
+    board_parser.add_argument("--metric", type=str, default=None, help="Run-level metric to show (default: mean per-sample score)")
+    board_parser.add_argument("--column", type=str, default="score", help="Per-sample column to average when --metric is not given")
+
+    rescore_parser = subparsers.add_parser("rescore", help="Recompute parsed outputs and scores from stored responses")
+    rescore_parser.add_argument("--task", type=str, required=True)
+    rescore_parser.add_argument("--model", type=str, default=None, help="Only rescore runs of this model")
+    rescore_parser.add_argument("--columns", nargs="+", default=None, help="Columns to replace (default: all scored columns); must include every score column")
+
+    args = parser.parse_args()
+    store = ResultsStore(args.results)
+    if args.command == "runs":
+        for meta in store.runs(args.task, args.model):
+            print(json.dumps(meta, ensure_ascii=False))
+    elif args.command == "leaderboard":
+        print(format_leaderboard(store.leaderboard(args.metric, args.column)))
+    elif args.command == "rescore":
+        from tasks import load_all_tasks
+        store.rescore(load_all_tasks()[args.task], args.columns, args.model)
+
+if __name__ == "__main__":
+    main()
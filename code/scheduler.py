@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Request scheduling for provider calls: per-key RPM/TPM budgets, token estimates and adaptive concurrency
+"""
+
+import asyncio
+import functools
+import logging
+import random
+import threading
+import time
+
+class MinuteBudget:
+    """Requests-per-minute and tokens-per-minute buckets shared by every call made with one provider key.
+
+    Both buckets start full and refill continuously. A request is charged its estimated
+    tokens (prompt plus output cap, as providers count them on admission) when it is
+    dispatched; one larger than the whole TPM budget waits for a full bucket. `pause`
+    holds back every request on the key, e.g. for the Retry-After of a 429.
+    """
+
+    def __init__(self, rpm=None, tpm=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = rpm or 0
+        self.tokens = tpm or 0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def try_take(self, tokens=0):
+        """Charge one request of `tokens` tokens and return 0, or return the seconds to wait before trying again."""
+        with self.lock:
+            now = time.monotonic()
+            elapsed, self.updated = now - self.updated, now
+            wait = max(0.0, self.paused_until - now)
+            if self.rpm:
+                self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+                if self.requests < 1:
+                    wait = max(wait, (1 - self.requests) * 60 / self.rpm)
+            if self.tpm:
+                tokens = min(tokens, self.tpm)
+                self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+                if self.tokens < tokens:
+                    wait = max(wait, (tokens - self.tokens) * 60 / self.tpm)
+            if wait > 0:
+                return wait
+            if self.rpm:
+                self.requests -= 1
+            if self.tpm:
+                self.tokens -= tokens
+            return 0.0
+
+    async def acquire(self, tokens=0):
+        while (wait := self.try_take(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+# Budgets per (service, API key), shared by every run in the process
+BUDGETS = {}
+BUDGETS_LOCK = threading.Lock()
+
+def get_budget(service_choice, client, rpm=None, tpm=None):
+    """The MinuteBudget of the client's API key, recreated when the limits change."""
+    key = (service_choice, getattr(client, "api_key", None) or id(client))
+    with BUDGETS_LOCK:
+        budget = BUDGETS.get(key)
+        if budget is None or (budget.rpm, budget.tpm) != (rpm, tpm):
+            budget = BUDGETS[key] = MinuteBudget(rpm, tpm)
+        return budget
+
+class AdaptiveConcurrency:
+    """Additive-increase/multiplicative-decrease limit on the requests in flight.
+
+    Every success raises the limit by 1/limit, about one per round of requests, up to
+    `maximum`. A 429, or a latency over `spike_factor` times the moving average, multiplies
+    it by `decrease`, at most once per `cooldown` seconds so that one burst counts once.
+    """
+
+    def __init__(self, maximum, minimum=1, decrease=0.5, spike_factor=3.0, cooldown=5.0, warmup=10):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(maximum)
+        self.decrease = decrease
+        self.spike_factor = spike_factor
+        self.cooldown = cooldown
+        self.warmup = warmup
+        self.in_flight = 0
+        self.latency = None
+        self.samples = 0
+        self.last_decrease = float("-inf")
+        self.condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency=None, throttled=False):
+        async with self.condition:
+            self.in_flight -= 1
+            spike = False
+            if latency is not None:
+                spike = (self.spike_factor is not None and self.samples >= self.warmup
+                         and latency > self.spike_factor * self.latency)
+                self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+                self.samples += 1
+            if throttled or spike:
+                self.back_off("429" if throttled else f"latency spike ({latency:.1f}s)")
+            elif latency is not None:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def back_off(self, reason):
+        now = time.monotonic()
+        if now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease)
+        logging.info(f"Concurrency lowered to {int(self.limit)} after a {reason}.")
+
+def status_code(error):
+    for source in (error, getattr(error, "response", None)):
+        code = getattr(source, "status_code", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+def is_rate_limited(error):
+    return status_code(error) == 429 or type(error).__name__ in ("RateLimitError", "TooManyRequestsError")
+
+def is_retryable(error):
+    """429s, server errors, timeouts and dropped connections; client errors such as 400 or 401 are not retried."""
+    code = status_code(error)
+    if is_rate_limited(error) or (code is not None and code >= 500):
+        return True
+    name = type(error).__name__
+    return code is None and (isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name)
+
+def retry_delay(error, attempt, base=1.0, maximum=60.0):
+    """The Retry-After of the response when given, otherwise exponential backoff with jitter."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or getattr(error, "headers", None) or {}
+    try:
+        return min(maximum, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return min(maximum, base * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+@functools.lru_cache(maxsize=None)
+def cached_tokenizer(tokenizer_name):
+    """The tokenizer of `tokenizer_name`, loaded once per process for every run that estimates with it."""
+    from preprocessing import load_tokenizer
+    return load_tokenizer(tokenizer_name)[0]
+
+def estimate_tokens(instruct_prompt, inputs, tokenizer_name, max_tokens=None):
+    """Estimated tokens of each request: the instruct prompt and input with the model's tokenizer, plus the output cap."""
+    tokenizer = cached_tokenizer(tokenizer_name)
+    instruct_tokens = len(tokenizer(instruct_prompt, add_special_tokens=False)["input_ids"])
+    texts = list(inputs)
+    counts = []
+    for start in range(0, len(texts), 1000):
+        encodings = tokenizer(texts[start:start + 1000], add_special_tokens=False)["input_ids"]
+        counts.extend(instruct_tokens + len(input_ids) + (max_tokens or 0) for input_ids in encodings)
+    return counts
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Batched BLEU/chrF++, ROUGE-2 and SQuAD v2 scoring over whole prediction/reference lists
+"""
+
+import os
+import re
+import string
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+# Below this many pairs the process pool costs more than it saves
+MIN_PARALLEL_SIZE = 2000
+MIN_PARALLEL_ROUGE_SIZE = 500
+
+def _translation_stats(predictions, references):
+    # One metric object per shard; references are tokenized and their n-grams cached once
+    from sacrebleu.metrics import BLEU, CHRF
+    bleu = BLEU()
+    chrf = CHRF(word_order=2)
+    bleu_stats = bleu._extract_corpus_statistics(predictions, [references])
+    chrf_stats = chrf._extract_corpus_statistics(predictions, [references])
+    sentence_bleu = [bleu._compute_score_from_stats(stats).score for stats in bleu_stats]
+    return bleu_stats, chrf_stats, sentence_bleu
+
+def _shards(items, n):
+    size = max(1, -(-len(items) // n))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def score_translations(predictions, references, processes=None):
+    """Score predictions against single references in one pass.
+
+    Returns corpus BLEU, the mean of sentence-level BLEU (each sentence scored as its own
+    corpus, as `utils.calculate_sacrebleu` does), corpus chrF++ and the per-sentence BLEU
+    scores. Statistics are extracted in shards across a process pool and summed, so the
+    corpus scores are identical to scoring the lists in a single process.
+    """
+    from sacrebleu.metrics import BLEU, CHRF
+    predictions = list(predictions)
+    references = list(references)
+    if len(predictions) != len(references):
+        raise ValueError(f"Got {len(predictions)} predictions for {len(references)} references.")
+
+    processes = processes or os.cpu_count() or 1
+    if processes > 1 and len(predictions) >= MIN_PARALLEL_SIZE:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            shards = list(executor.map(
+                _translation_stats, _shards(predictions, processes), _shards(references, processes)
+            ))
+    else:
+        shards = [_translation_stats(predictions, references)]
+
+    bleu_stats = [stats for shard in shards for stats in shard[0]]
+    chrf_stats = [stats for shard in shards for stats in shard[1]]
+    sentence_bleu = [score for shard in shards for score in shard[2]]
+
+    return {
+        "corpus_bleu": BLEU()._aggregate_and_compute(bleu_stats).score,
+        "mean_sentence_bleu": sum(sentence_bleu) / len(sentence_bleu),
+        "chrf++": CHRF(word_order=2)._aggregate_and_compute(chrf_stats).score,
+        "sentence_bleu": sentence_bleu,
+    }
+
+_rouge_scorer = None
+
+def _bengali_rouge_scorer():
+    # Built lazily so that every pool worker constructs its own stemmer once
+    global _rouge_scorer
+    if _rouge_scorer is None:
+        from rouge_score import rouge_scorer
+        _rouge_scorer = rouge_scorer.RougeScorer(['rouge2'], use_stemmer=True, lang="bengali")
+    return _rouge_scorer
+
+def _rouge2_ngrams(texts):
+    from rouge_score import rouge_scorer
+    tokenizer = _bengali_rouge_scorer()._tokenizer
+    return [rouge_scorer._create_ngrams(tokenizer.tokenize(text), 2) for text in texts]
+
+def _rouge2_fmeasures(reference_ngrams, candidates):
+    from rouge_score import rouge_scorer
+    return [
+        rouge_scorer._score_ngrams(target, prediction).fmeasure
+        for target, prediction in zip(reference_ngrams, _rouge2_ngrams(candidates))
+    ]
+
+class Rouge2References:
+    """Bengali ROUGE-2 references that are tokenized and stemmed once.
+
+    The reference bigram counts are computed up front (across a process pool for large
+    sets) and reused for every candidate list passed to `score`, so scoring the raw and
+    the extracted summaries of a run only tokenizes the references once.
+    """
+
+    def __init__(self, references, processes=None):
+        self.references = list(references)
+        self.processes = processes or os.cpu_count() or 1
+        self.ngrams = [ngrams for shard in self._map(_rouge2_ngrams, self.references) for ngrams in shard]
+
+    def _parallel(self):
+        return self.processes > 1 and len(self.references) >= MIN_PARALLEL_ROUGE_SIZE
+
+    def _map(self, fn, *columns):
+        if not self._parallel():
+            return [fn(*columns)]
+        with ProcessPoolExecutor(max_workers=self.processes) as executor:
+            return list(executor.map(fn, *(_shards(column, self.processes) for column in columns)))
+
+    def score(self, candidates):
+        """Per-sample ROUGE-2 F-measures of `candidates` against the cached references."""
+        candidates = list(candidates)
+        if len(candidates) != len(self.references):
+            raise ValueError(f"Got {len(candidates)} candidates for {len(self.references)} references.")
+        return [score for shard in self._map(_rouge2_fmeasures, self.ngrams, candidates) for score in shard]
+
+def score_rouge2(references, processes=None, **variants):
+    """Score several candidate lists, e.g. `raw=...` and `concise=...`, against the same references."""
+    rouge_references = Rouge2References(references, processes=processes)
+    return {name: rouge_references.score(candidates) for name, candidates in variants.items()}
+
+_ARTICLES = re.compile(r"\b(a|an|the)\b", re.UNICODE)
+_PUNCTUATION = set(string.punctuation)
+
+@lru_cache(maxsize=None)
+def normalize_squad_answer(text):
+    """Lower-case and strip punctuation, articles and extra whitespace, as the official SQuAD v2 script does."""
+    text = "".join(ch for ch in text.lower() if ch not in _PUNCTUATION)
+    return " ".join(_ARTICLES.sub(" ", text).split())
+
+def _squad_f1(gold, prediction):
+    gold_tokens = normalize_squad_answer(gold).split()
+    prediction_tokens = normalize_squad_answer(prediction).split()
+    if not gold_tokens or not prediction_tokens:
+        return int(gold_tokens == prediction_tokens)
+    num_same = sum((Counter(gold_tokens) & Counter(prediction_tokens)).values())
+    if num_same == 0:
+        return 0
+    precision = num_same / len(prediction_tokens)
+    recall = num_same / len(gold_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+def _squad_scores(predictions, references):
+    exact_scores, f1_scores = [], []
+    for prediction, golds in zip(predictions, references):
+        golds = [gold for gold in golds if normalize_squad_answer(gold)] or [""]
+        exact_scores.append(max(int(normalize_squad_answer(gold) == normalize_squad_answer(prediction)) for gold in golds))
+        f1_scores.append(max(_squad_f1(gold, prediction) for gold in golds))
+    return exact_scores, f1_scores
+
+def _best_threshold(predictions, scores, no_answer_probabilities, has_answer):
+    # Same sweep over no-answer probabilities as find_best_thresh in the official script
+    best_score = current = sum(1 for answerable in has_answer if not answerable)
+    best_threshold = 0.0
+    for i in sorted(range(len(scores)), key=lambda i: no_answer_probabilities[i]):
+        if has_answer[i]:
+            current += scores[i]
+        elif predictions[i]:
+            current -= 1
+        if current > best_score:
+            best_score = current
+            best_threshold = no_answer_probabilities[i]
+    return 100.0 * best_score / len(scores), best_threshold
+
+def score_squad_v2(predictions, references, no_answer_probabilities=None, processes=None):
+    """SQuAD v2 EM/F1 with HasAns/NoAns breakdowns and best thresholds, computed locally.
+
+    `predictions` are answer strings ("" for no answer) and `references` are lists of gold
+    answer strings (empty for unanswerable questions). The returned keys and values match
+    the `squad_v2` metric from `evaluate`; the per-sample scores are added as
+    "exact_scores" and "f1_scores".
+    """
+    predictions = list(predictions)
+    references = [list(golds) for golds in references]
+    if len(predictions) != len(references):
+        raise ValueError(f"Got {len(predictions)} predictions for {len(references)} references.")
+    if no_answer_probabilities is None:
+        no_answer_probabilities = [0.0 if prediction else 1.0 for prediction in predictions]
+
+    processes = processes or os.cpu_count() or 1
+    if processes > 1 and len(predictions) >= MIN_PARALLEL_SIZE:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            shards = list(executor.map(_squad_scores, _shards(predictions, processes), _shards(references, processes)))
+    else:
+        shards = [_squad_scores(predictions, references)]
+    exact_scores = [score for shard in shards for score in shard[0]]
+    f1_scores = [score for shard in shards for score in shard[1]]
+
+    has_answer = [bool(golds) for golds in references]
+    total = len(predictions)
+    results = {
+        "exact": 100.0 * sum(exact_scores) / total,
+        "f1": 100.0 * sum(f1_scores) / total,
+        "total": total,
+    }
+    for prefix, answerable in (("HasAns", True), ("NoAns", False)):
+        indices = [i for i in range(total) if has_answer[i] == answerable]
+        if indices:
+            results[f"{prefix}_exact"] = 100.0 * sum(exact_scores[i] for i in indices) / len(indices)
+            results[f"{prefix}_f1"] = 100.0 * sum(f1_scores[i] for i in indices) / len(indices)
+            results[f"{prefix}_total"] = len(indices)
+    results["best_exact"], results["best_exact_thresh"] = _best_threshold(predictions, exact_scores, no_answer_probabilities, has_answer)
+    results["best_f1"], results["best_f1_thresh"] = _best_threshold(predictions, f1_scores, no_answer_probabilities, has_answer)
+    results["exact_scores"] = exact_scores
+    results["f1_scores"] = f1_scores
+    return results
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Sequential early-stopping evaluation with confidence intervals
+"""
+
+import logging
+import math
+import random
+from statistics import NormalDist
+
+def wilson_interval(successes, n, confidence=0.95):
+    """Wilson score interval for a binomial proportion."""
+    if n == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return center - half_width, center + half_width
+
+def normal_interval(scores, confidence=0.95):
+    """Normal-approximation interval for the mean of per-sample scores."""
+    n = len(scores)
+    if n == 0:
+        return float("-inf"), float("inf")
+    mean = sum(scores) / n
+    if n < 2:
+        return mean, mean
+    variance = sum((x - mean) ** 2 for x in scores) / (n - 1)
+    half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * math.sqrt(variance / n)
+    return mean - half_width, mean + half_width
+
+def bootstrap_interval(scores, confidence=0.95, resamples=1000, seed=0):
+    """Percentile bootstrap interval for the mean of per-sample scores."""
+    rng = random.Random(seed)
+    n = len(scores)
+    if n == 0:
+        return float("-inf"), float("inf")
+    means = sorted(sum(rng.choices(scores, k=n)) / n for _ in range(resamples))
+    alpha = (1 - confidence) / 2
+    return means[int(alpha * (resamples - 1))], means[int((1 - alpha) * (resamples - 1))]
+
+def is_binary(scores):
+    return all(score in (0, 1) for score in scores)
+
+def confidence_interval(scores, confidence=0.95):
+    if is_binary(scores):
+        return wilson_interval(sum(scores), len(scores), confidence)
+    return normal_interval(scores, confidence)
+
+def run_sequential(task, service_choice, client, model_name, test_data, target_half_width=None, baseline=None,
+                   batch_size=50, min_samples=100, confidence=0.95, seed=0, checkpoint=None, results=None,
+                   **generation_kwargs):
+    """Evaluate `task` on a seeded random order of `test_data` in batches until the answer is clear.
+
+    After each batch the confidence interval of the mean per-sample score (the "score"
+    column of Task.score) is computed: Wilson for 0/1 scores such as accuracy, a normal
+    approximation otherwise, so `target_half_width` and `baseline` are on the scale of the
+    per-sample score (e.g. 0-100 for sentence BLEU). Sampling stops once the half-width is
+    at most `target_half_width`, or once the interval excludes `baseline`, e.g. another
+    model's score, after at least `min_samples` samples.
+
+    The reported `ci_low`/`ci_high` are that same interval, so they agree with the stop
+    reason; for non-binary scores a percentile bootstrap interval is reported alongside.
+    """
+    if len(test_data) == 0:
+        raise ValueError("Sequential evaluation needs a non-empty test split")
+    if checkpoint is not None:
+        logging.warning("Checkpointing is not supported in sequential mode; use --cache to reuse responses.")
+        checkpoint.close()
+    if generation_kwargs.get("telemetry") is not None:
+        generation_kwargs["telemetry"] = generation_kwargs["telemetry"].bind(task=task.name)
+
+    order = list(range(len(test_data)))
+    random.Random(seed).shuffle(order)
+
+    evaluated, responses, scores = [], [], []
+    stop_reason = "exhausted"
+    low, high = 0.0, 0.0
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        batch_data = test_data.select(batch)
+        batch_responses = task.generate(service_choice, client, model_name, batch_data, **generation_kwargs)
+        _, columns = task.score(batch_data, batch_responses)
+        evaluated.extend(batch)
+        responses.extend(batch_responses)
+        scores.extend(columns["score"])
+
+        low, high = confidence_interval(scores, confidence)
+        mean = sum(scores) / len(scores)
+        logging.info(f"Sequential: {len(scores)} samples, mean {mean:.4f}, {confidence:.0%} CI [{low:.4f}, {high:.4f}]")
+        if len(scores) < min_samples:
+            continue
+        if target_half_width is not None and (high - low) / 2 <= target_half_width:
+            stop_reason = "target_half_width"
+            break
+        if baseline is not None and not low <= baseline <= high:
+            stop_reason = "separated_from_baseline"
+            break
+
+    # Aggregate metrics such as corpus BLEU are computed once over every evaluated sample
+    metrics, columns = task.score(test_data.select(evaluated), responses)
+    if results is not None:
+        results.write(task, service_choice, model_name, evaluated, responses, columns, metrics)
+    result = {
+        "metrics": metrics,
+        "mean_score": sum(scores) / len(scores),
+        "ci_low": low,
+        "ci_high": high,
+        "confidence": confidence,
+        "samples": len(scores),
+        "full_size": len(test_data),
+        "api_calls_saved": len(test_data) - len(scores),
+        "stop_reason": stop_reason,
+    }
+    if not is_binary(scores):
+        result["bootstrap_ci_low"], result["bootstrap_ci_high"] = bootstrap_interval(scores, confidence, seed=seed)
+    for metric, value in metrics.items():
+        logging.info(f"{metric} for {service_choice} model '{model_name}': {value}")
+    logging.info(f"Sequential evaluation stopped ({stop_reason}) after {len(scores)} of {len(test_data)} samples; "
+                 f"{result['api_calls_saved']} API calls saved. Mean {result['mean_score']:.4f}, "
+                 f"{confidence:.0%} CI [{result['ci_low']:.4f}, {result['ci_high']:.4f}]")
+    return result
+
+def add_sequential_args(parser):
+    parser.add_argument("--sequential", action="store_true", help="Sample the test split in random order and stop early once the confidence interval is tight enough")
+    parser.add_argument("--target-half-width", type=float, default=None, help="Stop once the CI half-width of the per-sample score is at most this")
+    parser.add_argument("--baseline", type=float, default=None, help="Stop once the CI excludes this score (e.g. another model's mean per-sample score)")
+    parser.add_argument("--check-every", type=int, default=50, help="Samples evaluated between CI checks")
+    parser.add_argument("--min-samples", type=int, default=100, help="Never stop before this many samples")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the interval")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random sample order")
+
+def sequential_options(args):
+    """Collect the keyword arguments for `run_sequential`, or None when --sequential is not set."""
+    if not args.sequential:
+        return None
+    return {
+        "target_half_width": args.target_half_width,
+        "baseline": args.baseline,
+        "batch_size": args.check_every,
+        "min_samples": args.min_samples,
+        "confidence": args.confidence,
+        "seed": args.seed,
+    }
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Sharded evaluation: run contiguous index ranges of a test split in separate processes or hosts and merge them exactly
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import re
+import shlex
+import subprocess
+import threading
+import time
+from urllib.parse import quote
+
+def parse_shard(text):
+    """argparse type for --shard: "i/N" with 0 <= i < N."""
+    match = re.fullmatch(r"(\d+)/(\d+)", text.strip())
+    if not match or not 0 <= int(match.group(1)) < int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"Invalid shard '{text}'; expected i/N with 0 <= i < N, e.g. 0/4")
+    return int(match.group(1)), int(match.group(2))
+
+def shard_suffix(shard):
+    index, count = shard
+    return f".shard-{index}-of-{count}"
+
+def shard_indices(size, shard):
+    """Row indices of one shard: the i-th of N contiguous, near-equal ranges of `size` rows.
+
+    Contiguous ranges keep rows that share a context (as packed QnA requests do) together.
+    """
+    index, count = shard
+    return list(range(index * size // count, (index + 1) * size // count))
+
+class ShardStore:
+    """Partial results of sharded runs under <root>/task=<task>/model=<model>/shard-<i>-of-<N>.parquet.
+
+    Files use the results store's row layout with indices into the full split; the schema
+    metadata records the shard, the split size and the shard's own metrics.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def directory(self, task_name, model_name):
+        return os.path.join(self.root, f"task={quote(task_name, safe='')}", f"model={quote(model_name, safe='')}")
+
+    def path(self, task_name, model_name, shard):
+        index, count = shard
+        return os.path.join(self.directory(task_name, model_name), f"shard-{index}-of-{count}.parquet")
+
+    def write(self, task, service_choice, model_name, shard, size, indices, responses, columns, metrics):
+        from results import ResultsStore, run_table
+        from tasks import prompt_hash
+        index, count = shard
+        timestamp = time.time()
+        run_id = f"shard-{index}-of-{count}"
+        table = run_table(indices, responses, columns, service_choice, prompt_hash(task), timestamp, run_id)
+        meta = {"task": task.name, "model": model_name, "service": service_choice, "shard": index, "shards": count,
+                "size": size, "timestamp": timestamp, "prompt_hash": prompt_hash(task), "samples": len(indices),
+                "metrics": metrics}
+        path = self.path(task.name, model_name, shard)
+        ResultsStore.write_table(path, table, meta)
+        logging.info(f"Shard {index}/{count} written to {path}")
+        return path
+
+    def read(self, task_name, model_name, count):
+        """Return [(meta, table)] for shards 0..count-1, raising if any is missing."""
+        import pyarrow.parquet as pq
+        from results import ResultsStore
+        parts, missing = [], []
+        for index in range(count):
+            path = self.path(task_name, model_name, (index, count))
+            if not os.path.exists(path):
+                missing.append(index)
+                continue
+            parts.append((ResultsStore.run_meta(path), pq.read_table(path)))
+        if missing:
+            raise FileNotFoundError(f"Missing shards {', '.join(map(str, missing))} of {count} for task '{task_name}' "
+                                    f"and model '{model_name}' under {self.directory(task_name, model_name)}")
+        return parts
+
+def run_shard(task, service_choice, client, model_name, test_data, shard=None, merge=None, directory="shards",
+              checkpoint=None, telemetry=None, results=None, **generation_kwargs):
+    """Run `shard` (i, N) of `test_data` and write its partial results, or merge `merge` shards when given."""
+    store = ShardStore(directory)
+    if merge:
+        return merge_shards(task, service_choice, model_name, test_data, store, merge, results)
+
+    indices = shard_indices(len(test_data), shard)
+    logging.info(f"Shard {shard[0]}/{shard[1]}: rows {indices[0] if indices else 0}-{indices[-1] if indices else 0} "
+                 f"of {len(test_data)}.")
+    shard_data = test_data.select(indices)
+    if checkpoint is not None:
+        from tasks import run_fingerprint
+        checkpoint.start_run(run_fingerprint(task, service_choice, model_name, test_data,
+                                             generation_kwargs.get("stream", False), shard=list(shard)))
+    if telemetry is not None:
+        telemetry = telemetry.bind(task=task.name)
+    responses = task.generate(service_choice, client, model_name, shard_data,
+                              checkpoint=checkpoint, telemetry=telemetry, **generation_kwargs)
+    metrics, columns = task.score(shard_data, responses)
+    if checkpoint is not None:
+        checkpoint.record_all(**columns)
+        checkpoint.close()
+    store.write(task, service_choice, model_name, shard, len(test_data), indices, responses, columns, metrics)
+
+    for metric, value in metrics.items():
+        logging.info(f"Shard {shard[0]}/{shard[1]} {metric} for {service_choice} model '{model_name}': {value}")
+    return metrics
+
+def merge_shards(task, service_choice, model_name, test_data, store, count, results=None):
+    """Recombine the responses of every shard in index order and score them over the full split.
+
+    Aggregate metrics (corpus BLEU, SQuAD v2, ROUGE) are recomputed from the merged
+    responses by Task.score rather than combined from shard metrics, so the result equals
+    that of a single-process run.
+    """
+    parts = store.read(task.name, model_name, count)
+    hashes = {meta["prompt_hash"] for meta, _ in parts}
+    if len(hashes) > 1:
+        raise ValueError(f"Shards of task '{task.name}' were run with different prompts or generation profiles")
+    sizes = {meta["size"] for meta, _ in parts}
+    if sizes != {len(test_data)}:
+        raise ValueError(f"Shards cover a split of {', '.join(map(str, sorted(sizes)))} rows, "
+                         f"but the loaded split has {len(test_data)}; merge with the same dataset_range argument the shards were run with")
+
+    responses = {}
+    for _, table in parts:
+        responses.update(zip(table["index"].to_pylist(), table["response"].to_pylist()))
+    if sorted(responses) != list(range(len(test_data))):
+        raise ValueError(f"Shards cover {len(responses)} of {len(test_data)} rows")
+    responses = [responses[i] for i in range(len(test_data))]
+
+    metrics, columns = task.score(test_data, responses)
+    if results is not None:
+        results.write(task, service_choice, model_name, list(range(len(responses))), responses, columns, metrics)
+    for metric, value in metrics.items():
+        logging.info(f"{metric} for {service_choice} model '{model_name}' merged from {count} shards: {value}")
+    return metrics
+
+def shard_command(command, shard):
+    return [*command, "--shard", f"{shard[0]}/{shard[1]}"]
+
+def launch(command, shards, hosts=None, workers=None, merge=True):
+    """Run `command` once per shard, appending --shard i/N, then once more with --merge-shards N.
+
+    Without `hosts` the shards run as local subprocesses, `workers` at a time (default: all
+    at once). With `hosts` each host runs `workers` shards at a time (default: an even share)
+    over ssh in the current directory, which must be on a filesystem shared by all hosts.
+    Returns the exit codes of the shards.
+    """
+    cwd = os.getcwd()
+    if hosts:
+        workers = workers or -(-shards // len(hosts))
+        slots = [host for host in hosts for _ in range(workers)]
+    else:
+        slots = [None] * (workers or shards)
+
+    pending = queue.Queue()
+    for index in range(shards):
+        pending.put(index)
+    codes = {}
+
+    def run_slot(host):
+        while True:
+            try:
+                index = pending.get_nowait()
+            except queue.Empty:
+                return
+            argv = shard_command(command, (index, shards))
+            if host is not None:
+                argv = ["ssh", host, f"cd {shlex.quote(cwd)} && {shlex.join(argv)}"]
+            logging.info(f"Starting shard {index}/{shards}{f' on {host}' if host else ''}: {shlex.join(argv)}")
+            try:
+                codes[index] = subprocess.run(argv).returncode
+            except Exception as error:
+                # A shard that could not be started counts as failed instead of ending the slot without a code
+                logging.error(f"Shard {index}/{shards} could not be started: {error}")
+                codes[index] = 1
+                continue
+            if codes[index] != 0:
+                logging.error(f"Shard {index}/{shards} exited with code {codes[index]}.")
+
+    threads = [threading.Thread(target=run_slot, args=(host,)) for host in slots]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    failed = sorted(index for index, code in codes.items() if code != 0)
+    if failed:
+        logging.error(f"Shards {', '.join(map(str, failed))} failed; rerun them with --shard before merging.")
+    elif merge:
+        subprocess.run([*command, "--merge-shards", str(shards)], check=True)
+    return [codes[index] for index in range(shards)]
+
+def main():
+    # Set up logging here, since utils imports this module for parse_shard
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Run a BanglaBench command as N shards over local processes or hosts and merge them.",
+                                     usage="%(prog)s --shards N [--hosts HOST ...] [--workers W] [--no-merge] -- command ...")
+    parser.add_argument("--shards", type=int, required=True, help="Number of shards")
+    parser.add_argument("--hosts", nargs="+", default=None, help="Run shards over ssh on these hosts (shared filesystem required)")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent shards per host, or locally")
+    parser.add_argument("--no-merge", action="store_true", help="Do not merge the shards once they all succeed")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="Evaluation command, e.g. python translation_evaluation.py KEY MODEL")
+    args = parser.parse_args()
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        parser.error("no command given")
+    codes = launch(command, args.shards, args.hosts, args.workers, merge=not args.no_merge)
+    print(json.dumps({"shards": args.shards, "exit_codes": codes}))
+    raise SystemExit(1 if any(codes) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Cold-start check: `--help` of every script must stay within an import-time budget and load no heavy library
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SCRIPTS = [
+    "translation_evaluation.py",
+    "paraphrasing_evaluation.py",
+    "inference_evaluation.py",
+    "summarization_evaluation.py",
+    "-m monolingual_summarization.evaluation",
+    "QnA_evaluation_BanglaRQA.py",
+    "banglabench.py",
+    "shards.py",
+    "benchmark.py",
+    "mock_server.py",
+    "results.py",
+    "token_index.py",
+]
+
+# Provider SDKs, tokenizers, metric and data libraries: loaded only once a run needs them
+HEAVY_MODULES = ["datasets", "transformers", "torch", "together", "cohere", "sacrebleu", "rouge_score",
+                 "normalizer", "evaluate", "pyarrow", "numpy", "pandas", "tqdm"]
+
+DEFAULT_BUDGET_MS = 150
+
+def import_times(argv):
+    """({module: cumulative microseconds}, exit code) of running `argv` under -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", *argv], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        try:
+            # Drop the separator space; nested imports keep their indentation
+            times[name.rstrip()[1:]] = int(cumulative)
+        except ValueError:
+            # The header line
+            continue
+    return times, result.returncode
+
+def check_script(script, baseline, repeat=3):
+    """Return (import milliseconds over the interpreter baseline, heavy modules imported, exit code) for `script --help`."""
+    best = None
+    for _ in range(repeat):
+        times, returncode = import_times([*script.split(), "--help"])
+        # Top-level entries are not indented; the interpreter's own startup imports are left out
+        total = sum(value for name, value in times.items() if not name.startswith(" ") and name not in baseline)
+        best = total if best is None else min(best, total)
+    heavy = sorted({name.strip().split(".")[0] for name in times} & set(HEAVY_MODULES))
+    return best / 1000, heavy, returncode
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if any script's --help imports heavy libraries or exceeds the import-time budget.")
+    parser.add_argument("--scripts", nargs="+", default=SCRIPTS, help="Scripts, or \"-m module\", to check (default: every CLI)")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Import-time budget per script in milliseconds")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per script; the fastest counts")
+    args = parser.parse_args()
+
+    baseline = set(import_times(["-c", "pass"])[0])
+    failures = []
+    for script in args.scripts:
+        elapsed, heavy, returncode = check_script(script, baseline, args.repeat)
+        note = f", heavy modules: {', '.join(heavy)}" if heavy else ""
+        logging.info(f"{script}: {elapsed:.0f} ms of imports{note}")
+        if returncode != 0:
+            failures.append(f"{script} --help exited with code {returncode}")
+        if heavy:
+            failures.append(f"{script} imports {', '.join(heavy)} for --help")
+        if elapsed > args.budget_ms:
+            failures.append(f"{script} takes {elapsed:.0f} ms of imports for --help (budget {args.budget_ms:.0f} ms)")
+
+    for failure in failures:
+        logging.error(failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -4,82 +4,62 @@ Summary Evaluation Script with Command Line Arguments
 """
 
 
-import os
 import logging
 import argparse
-from datasets import load_dataset
-from together import Together
-import cohere
-from transformers import AutoTokenizer
-from tqdm import tqdm
-from rouge_score import rouge_scorer
-from utils import generate_content_together, generate_content_aya, extract_summary
+from data import LazyColumn
+from preprocessing import truncated_split
+from scoring import score_rouge2
+from tasks import Task, register_task, evaluate
+from utils import GenerationProfile, add_generation_args, generation_options, extract_summary, first_sentence_end
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 instruct_prompt = "Please write a one sentence Bengali summary/TL;DR of the given English article. The summary must be very concise and must be in Bangla. Just return the summary without any preamble, quotations, or explanations."
 
-UPPER_LIMIT = 8000
+@register_task
+class CrosslingualSummarizationTask(Task):
+    name = "crosslingual_summarization"
+    instruct_prompt = instruct_prompt
+    desc = "Generating summaries"
+    profile = GenerationProfile(max_tokens=256, complete=first_sentence_end)
+    dataset = ("csebuetnlp/CrossSum", "english-bengali", "test")
+    reference_column = "summary"
+    truncation_column = "text"
 
-def truncate_long_articles(example, tokenizer):
-    tokens = tokenizer(example["text"])["input_ids"]
-    if len(tokens) > UPPER_LIMIT:
-        example["text"] = tokenizer.decode(tokens[:UPPER_LIMIT], skip_special_tokens=True)
-    return example
+    def load(self, model_name, dataset_range=None):
+        # Truncate long articles with the model's tokenizer, reusing a cached artifact when one exists
+        path, name, split = self.dataset
+        test_data = truncated_split(path, name, split=split, tokenizer_name=model_name)
+        return test_data.select(range(dataset_range)) if dataset_range else test_data
 
-def main(api_key, service_choice, model_name):
-    ds = load_dataset("csebuetnlp/CrossSum", "english-bengali")
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    
-    if service_choice == "together":
-        os.environ["TOGETHER_API_KEY"] = api_key
-        client = Together(api_key=api_key)
-        generate_content = lambda input_text: generate_content_together(client, instruct_prompt, input_text, model_name)
-    elif service_choice == "cohere":
-        client = cohere.Client(api_key)
-        generate_content = lambda input_text: generate_content_aya(client, instruct_prompt, input_text, model_name)
-    else:
-        logging.error("Invalid service choice. Please select either 'together' or 'cohere'.")
-        return
-    
-    # Preprocess dataset to truncate long articles
-    ds = ds.map(lambda x: truncate_long_articles(x, tokenizer))
+    def dataset_key(self, model_name):
+        return (self.name, model_name)
 
-    generated_summaries = []
-    for data in tqdm(ds["test"], desc="Generating summaries"):
-        input_text = data["text"]
-        generated_summary = generate_content(input_text)
-        generated_summaries.append(generated_summary)
+    def inputs(self, test_data):
+        return LazyColumn(test_data, "text")
 
-    scorer = rouge_scorer.RougeScorer(['rouge2'], use_stemmer=True, lang="bengali")
+    def score(self, test_data, generated_summaries):
+        generated_summaries2 = [extract_summary(summary) for summary in generated_summaries]
 
-    # Calculate ROUGE-2 scores
-    rouge_scores = []
-    for i, generated_summary in enumerate(generated_summaries):
-        reference_summary = ds["test"][i]["summary"]
-        rouge_score = scorer.score(reference_summary, generated_summary)['rouge2'].fmeasure
-        rouge_scores.append(rouge_score)
+        # Calculate ROUGE-2 scores, tokenizing the references once for both variants
+        rouge_scores = score_rouge2(test_data["summary"], raw=generated_summaries, concise=generated_summaries2)
 
-    average_rouge2 = sum(rouge_scores) / len(rouge_scores)
-    logging.info(f"Average ROUGE-2 score (raw): {average_rouge2}")
+        metrics = {}
+        for variant, scores in rouge_scores.items():
+            metrics[f"Average ROUGE-2 score ({variant})"] = sum(scores) / len(scores)
+        columns = {"parsed": generated_summaries2, "score_raw": rouge_scores["raw"], "score": rouge_scores["concise"]}
+        return metrics, columns
 
-    generated_summaries2 = [extract_summary(summary) for summary in generated_summaries]
-
-    rouge_scores = []
-    for i, generated_summary in enumerate(generated_summaries2):
-        reference_summary = ds["test"][i]["summary"]
-        rouge_score = scorer.score(reference_summary, generated_summary)['rouge2'].fmeasure
-        rouge_scores.append(rouge_score)
-
-    average_rouge2 = sum(rouge_scores) / len(rouge_scores)
-    logging.info(f"Average ROUGE-2 score (concise): {average_rouge2}")
+def main(api_key, service_choice, model_name, **generation_kwargs):
+    return evaluate(CrosslingualSummarizationTask(), api_key, service_choice, model_name, **generation_kwargs)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate Bengali summaries from English articles and evaluate using ROUGE-2.")
     parser.add_argument("api_key", type=str, help="API key for the chosen service")
-    parser.add_argument("service_choice", choices=["together", "cohere"], help="Service choice: 'together' or 'cohere'")
+    parser.add_argument("service_choice", choices=["together", "cohere", "local"], help="Service choice: 'together', 'cohere' or 'local' (a Hugging Face model run on CPU)")
     parser.add_argument("model_name", type=str, help="Model name for tokenizer and chosen API service")
+    add_generation_args(parser)
     args = parser.parse_args()
 
-    main(args.api_key, args.service_choice, args.model_name)
+    main(args.api_key, args.service_choice, args.model_name, **generation_options(args))
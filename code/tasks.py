@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Task plugin registry shared by the evaluation scripts and the sweep runner
+"""
+
+import hashlib
+import importlib
+import json
+import logging
+from utils import GENERATORS, create_client, generate_all
+
+TASKS = {}
+
+# Modules that register a task when imported
+TASK_MODULES = [
+    "translation_evaluation",
+    "paraphrasing_evaluation",
+    "inference_evaluation",
+    "summarization_evaluation",
+    "monolingual_summarization.evaluation",
+    "QnA_evaluation_BanglaRQA",
+]
+
+def register_task(cls):
+    """Class decorator that adds an instance of a Task subclass to TASKS under its `name`."""
+    TASKS[cls.name] = cls()
+    return cls
+
+def load_all_tasks():
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+    return TASKS
+
+class Task:
+    """One benchmark task: which split to load, how to build prompts and how to score responses."""
+
+    name = None
+    instruct_prompt = None
+    services = ("together", "cohere", "local")
+    desc = "Generating"
+    # utils.GenerationProfile with the task's output-token cap, stop sequences and streaming cut-off
+    profile = None
+    # (path, config name, split) of the test data
+    dataset = None
+    # Column holding the reference output, used to estimate completion tokens
+    reference_column = None
+    # Input column that is cut to a token limit when the split is loaded
+    truncation_column = None
+
+    def load(self, model_name, dataset_range=None):
+        """Return the test split, limited to the first `dataset_range` rows when given."""
+        raise NotImplementedError
+
+    def dataset_key(self, model_name):
+        """Key under which a loaded split can be shared between models."""
+        return self.name
+
+    def inputs(self, test_data):
+        raise NotImplementedError
+
+    def generate(self, service_choice, client, model_name, test_data, **generation_kwargs):
+        """Return one raw response per row of `test_data`; override to change how requests are built."""
+        return generate_all(service_choice, client, self.instruct_prompt, self.inputs(test_data), model_name,
+                            profile=self.profile, desc=self.desc, **generation_kwargs)
+
+    def score(self, test_data, responses):
+        """Return (metrics, per-sample columns) for the responses, in dataset order."""
+        raise NotImplementedError
+
+def prompt_hash(task):
+    """Hash of what determines the requests of a task: its instruct prompt and generation profile."""
+    params = task.profile.params() if task.profile is not None else {}
+    payload = json.dumps([task.instruct_prompt, params], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def run_fingerprint(task, service_choice, model_name, test_data, stream=False, **extra):
+    """What a run's responses depend on, stored as the header of its checkpoint log."""
+    return {
+        "task": task.name,
+        "service": service_choice,
+        "model": model_name,
+        "dataset": list(task.dataset) if task.dataset else None,
+        # The first `dataset_range` rows are loaded, so the row count identifies the slice
+        "rows": len(test_data),
+        "prompt_hash": prompt_hash(task),
+        "stream": bool(stream),
+        **extra,
+    }
+
+def run_task(task, service_choice, client, model_name, test_data, checkpoint=None, telemetry=None, results=None,
+             shard=None, **generation_kwargs):
+    """Generate and score `test_data`, logging the metrics and writing per-sample results to `results` when given.
+
+    `shard` holds the options of `shards.run_shard`, to run one shard of `test_data` or merge all of them.
+    """
+    if shard is not None:
+        from shards import run_shard
+        return run_shard(task, service_choice, client, model_name, test_data, checkpoint=checkpoint,
+                         telemetry=telemetry, results=results, **shard, **generation_kwargs)
+    if checkpoint is not None:
+        checkpoint.start_run(run_fingerprint(task, service_choice, model_name, test_data,
+                                             generation_kwargs.get("stream", False)))
+    if telemetry is not None:
+        telemetry = telemetry.bind(task=task.name)
+    responses = task.generate(service_choice, client, model_name, test_data,
+                              checkpoint=checkpoint, telemetry=telemetry, **generation_kwargs)
+    metrics, columns = task.score(test_data, responses)
+
+    if checkpoint is not None:
+        checkpoint.record_all(**columns)
+        checkpoint.close()
+    if results is not None:
+        results.write(task, service_choice, model_name, list(range(len(responses))), responses, columns, metrics)
+
+    for metric, value in metrics.items():
+        logging.info(f"{metric} for {service_choice} model '{model_name}': {value}")
+    return metrics
+
+def evaluate(task, api_key, service_choice, model_name, dataset_range=None, sequential=None, **generation_kwargs):
+    """Entry point used by the single-task scripts.
+
+    `sequential` holds the options of `sequential.run_sequential`; when given, the split is
+    sampled in random order and evaluation stops as soon as the confidence interval allows.
+    """
+    if service_choice not in GENERATORS or service_choice not in task.services:
+        logging.error(f"Invalid service choice. Please choose one of {', '.join(task.services)}.")
+        return
+
+    test_data = task.load(model_name, dataset_range)
+    logging.info("Dataset loaded successfully.")
+
+    client = create_client(service_choice, api_key)
+    logging.info(f"Evaluating using {service_choice} API.")
+    # Only run_task shards; the generation path below it takes no shard option
+    shard = generation_kwargs.pop("shard", None)
+    if sequential is not None and shard is not None:
+        logging.error("Sequential evaluation cannot be sharded; drop --sequential or --shard.")
+        return
+
+    if sequential is not None:
+        from sequential import run_sequential
+        metrics = run_sequential(task, service_choice, client, model_name, test_data, **sequential, **generation_kwargs)
+    else:
+        metrics = run_task(task, service_choice, client, model_name, test_data, shard=shard, **generation_kwargs)
+    if generation_kwargs.get("telemetry") is not None:
+        generation_kwargs["telemetry"].export()
+    return metrics
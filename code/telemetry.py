@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+Per-request telemetry: latency, token usage, Bengali tokenizer fertility and cost
+"""
+
+import json
+import logging
+import re
+import threading
+
+BENGALI_CHAR = re.compile("[\u0980-\u09FF]")
+
+def count_bengali_chars(text):
+    return len(BENGALI_CHAR.findall(text or ""))
+
+def is_mostly_bengali(text, threshold=0.5):
+    letters = sum(1 for char in text or "" if char.isalpha() or BENGALI_CHAR.match(char))
+    return letters > 0 and count_bengali_chars(text) / letters >= threshold
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+def ratio(numerator, denominator):
+    return numerator / denominator if denominator else None
+
+class Telemetry:
+    """Collects one record per provider call and aggregates them per (task, service, model).
+
+    `prices` maps model names to {"input": ..., "output": ...} prices in dollars per
+    million tokens and is used for the cost estimate. `bind(task=...)` returns a view that
+    adds labels to every record while sharing the same store, which is how run_task tags
+    the calls it makes.
+    """
+
+    def __init__(self, path=None, prices=None, labels=None, records=None, lock=None):
+        self.path = path
+        self.prices = prices or {}
+        self.labels = labels or {}
+        self.records = records if records is not None else []
+        self.lock = lock or threading.Lock()
+
+    def bind(self, **labels):
+        return Telemetry(self.path, self.prices, {**self.labels, **labels}, self.records, self.lock)
+
+    def cost(self, model_name, prompt_tokens, completion_tokens):
+        price = self.prices.get(model_name)
+        if price is None or prompt_tokens is None or completion_tokens is None:
+            return None
+        return (prompt_tokens * price.get("input", 0) + completion_tokens * price.get("output", 0)) / 1e6
+
+    def record(self, service, model_name, prompt, completion, latency=None, ttfb=None,
+               prompt_tokens=None, completion_tokens=None, retries=0, cached=False, error=None):
+        record = {
+            "task": self.labels.get("task"),
+            "service": service,
+            "model": model_name,
+            "latency": latency,
+            "ttfb": ttfb,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "retries": retries,
+            "cached": cached,
+            "error": error,
+            "cost": None if cached else self.cost(model_name, prompt_tokens, completion_tokens),
+            "prompt_chars": len(prompt or ""),
+            "prompt_bengali_chars": count_bengali_chars(prompt),
+            "completion_chars": len(completion or ""),
+            "completion_bengali_chars": count_bengali_chars(completion),
+            "completion_bengali": is_mostly_bengali(completion),
+        }
+        with self.lock:
+            self.records.append(record)
+
+    def summary(self):
+        with self.lock:
+            records = list(self.records)
+        groups = {}
+        for record in records:
+            groups.setdefault((record["task"], record["service"], record["model"]), []).append(record)
+
+        summary = []
+        for (task, service, model), group in sorted(groups.items(), key=lambda item: [str(x) for x in item[0]]):
+            sent = [r for r in group if not r["cached"]]
+            latencies = [r["latency"] for r in sent if r["latency"] is not None]
+            ttfbs = [r["ttfb"] for r in sent if r["ttfb"] is not None]
+            with_usage = [r for r in sent if r["prompt_tokens"] is not None and r["completion_tokens"] is not None]
+            prompt_tokens = sum(r["prompt_tokens"] for r in with_usage)
+            completion_tokens = sum(r["completion_tokens"] for r in with_usage)
+            costs = [r["cost"] for r in sent if r["cost"] is not None]
+            bengali_completions = [r for r in with_usage if r["completion_bengali"]]
+            summary.append({
+                "task": task,
+                "service": service,
+                "model": model,
+                "requests": len(group),
+                "cached": len(group) - len(sent),
+                "errors": sum(1 for r in group if r["error"]),
+                "retries": sum(r["retries"] for r in group),
+                "latency_count": len(latencies),
+                "latency_total": sum(latencies),
+                "latency_mean": ratio(sum(latencies), len(latencies)),
+                "latency_p50": percentile(latencies, 50),
+                "latency_p99": percentile(latencies, 99),
+                "ttfb_p50": percentile(ttfbs, 50),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "cost": sum(costs) if costs else None,
+                # Prompt counts include the instruct prompt and chat template, so they are plain
+                # tokens per character; fertility is measured on completions that are in Bengali
+                "prompt_tokens_per_char": ratio(prompt_tokens, sum(r["prompt_chars"] for r in with_usage)),
+                "completion_tokens_per_char": ratio(completion_tokens, sum(r["completion_chars"] for r in with_usage)),
+                "bengali_fertility": ratio(sum(r["completion_tokens"] for r in bengali_completions),
+                                           sum(r["completion_bengali_chars"] for r in bengali_completions)),
+            })
+        return summary
+
+    def export_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+    def export_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(prometheus_text(self.summary()))
+
+    def export(self):
+        """Write <path>.json and <path>.prom and log the per-model summary."""
+        for entry in self.summary():
+            logging.info(f"Telemetry: {entry}")
+        if self.path:
+            self.export_json(f"{self.path}.json")
+            self.export_prometheus(f"{self.path}.prom")
+            logging.info(f"Telemetry written to {self.path}.json and {self.path}.prom")
+
+PROMETHEUS_METRICS = [
+    ("requests", "banglabench_requests_total", "counter", "Provider calls, including cache hits"),
+    ("cached", "banglabench_cached_requests_total", "counter", "Calls served from the response cache"),
+    ("errors", "banglabench_request_errors_total", "counter", "Calls that raised an error"),
+    ("retries", "banglabench_request_retries_total", "counter", "Retried calls"),
+    ("prompt_tokens", "banglabench_prompt_tokens_total", "counter", "Prompt tokens reported by the provider"),
+    ("completion_tokens", "banglabench_completion_tokens_total", "counter", "Completion tokens reported by the provider"),
+    ("cost", "banglabench_cost_dollars_total", "counter", "Estimated cost in dollars"),
+    ("prompt_tokens_per_char", "banglabench_prompt_tokens_per_char", "gauge", "Prompt tokens per character, instruct prompt and chat template included"),
+    ("bengali_fertility", "banglabench_bengali_fertility", "gauge", "Completion tokens per Bengali character of Bengali completions"),
+]
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def prometheus_labels(entry, **extra):
+    labels = {"task": entry["task"] or "", "service": entry["service"], "model": entry["model"], **extra}
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + "}"
+
+def prometheus_text(summary):
+    lines = []
+    for key, name, metric_type, help_text in PROMETHEUS_METRICS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for entry in summary:
+            if entry[key] is not None:
+                lines.append(f"{name}{prometheus_labels(entry)} {entry[key]}")
+    # One summary family: quantile samples plus _sum and _count of the calls sent to the provider
+    lines.append("# HELP banglabench_request_latency_seconds Wall latency of provider calls")
+    lines.append("# TYPE banglabench_request_latency_seconds summary")
+    for entry in summary:
+        for quantile, key in (("0.5", "latency_p50"), ("0.99", "latency_p99")):
+            if entry[key] is not None:
+                lines.append(f"banglabench_request_latency_seconds{prometheus_labels(entry, quantile=quantile)} {entry[key]}")
+        lines.append(f"banglabench_request_latency_seconds_sum{prometheus_labels(entry)} {entry['latency_total']}")
+        lines.append(f"banglabench_request_latency_seconds_count{prometheus_labels(entry)} {entry['latency_count']}")
+    return "\n".join(lines) + "\n"
+
+def open_telemetry(args):
+    """Build a Telemetry from the --telemetry/--prices command-line options."""
+    if not args.telemetry:
+        return None
+    prices = None
+    if args.prices:
+        with open(args.prices, encoding="utf-8") as f:
+            prices = json.load(f)
+    return Telemetry(args.telemetry, prices=prices)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures: the scripts import each other as top-level modules from the code directory
+"""
+
+import os
+import sys
+import pytest
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CODE_DIR not in sys.path:
+    sys.path.insert(0, CODE_DIR)
+
+from tasks import Task
+
+class EchoTask(Task):
+    """Answers every row with "<model>:<text>"; rows of odd length score 1. Rows are strings or a "text" column."""
+
+    name = "echo"
+    instruct_prompt = "Repeat the input."
+
+    def inputs(self, test_data):
+        return test_data["text"] if hasattr(test_data, "column_names") else list(test_data)
+
+    def generate(self, service_choice, client, model_name, test_data, checkpoint=None, **generation_kwargs):
+        done = checkpoint.responses() if checkpoint is not None else {}
+        responses = [done.get(i, f"{model_name}:{text}") for i, text in enumerate(self.inputs(test_data))]
+        if checkpoint is not None:
+            for i, response in enumerate(responses):
+                checkpoint.record(i, response=response)
+        return responses
+
+    def score(self, test_data, responses):
+        scores = [float(response.endswith(text) and len(text) % 2 == 1)
+                  for text, response in zip(self.inputs(test_data), responses)]
+        return {"accuracy": sum(scores) / len(scores)}, {"score": scores}
+
+@pytest.fixture
+def echo_task():
+    return EchoTask()
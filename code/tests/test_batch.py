@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import pytest
+from mock_server import MockConfig, base_urls, start_mock_server
+
+pytest.importorskip("together")
+
+def test_batch_failures_go_through_generate_all(tmp_path, monkeypatch):
+    import batch
+    from utils import create_client, generate_all
+    calls = []
+    monkeypatch.setattr(batch, "generate_all", lambda *args, **kwargs: calls.append((args, kwargs)) or generate_all(*args, **kwargs))
+
+    server, url = start_mock_server(MockConfig(latency=0.0, error_rate=0.3, batch_latency=0.1, seed=0))
+    try:
+        client = create_client("together", "key", base_urls(url)["together"])
+        inputs = [f"sentence {i}" for i in range(20)]
+        responses = generate_all("together", client, "Repeat:", inputs, "model", concurrency=4, rate=0, max_retries=10,
+                                 batch={"directory": str(tmp_path), "poll_interval": 0.05})
+    finally:
+        server.shutdown()
+
+    assert responses == inputs
+    assert len(calls) == 1
+    args, kwargs = calls[0]
+    assert 0 < len(args[3]) < len(inputs)
+    assert kwargs["concurrency"] == 4 and kwargs["max_retries"] == 10
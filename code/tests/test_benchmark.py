@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+import pytest
+from mock_server import MockConfig
+
+pytest.importorskip("together")
+
+def test_benchmark_goes_through_generate_all(monkeypatch):
+    import benchmark
+    import utils
+    calls = []
+    generate_all = utils.generate_all
+    monkeypatch.setattr("tasks.generate_all", lambda *args, **kwargs: calls.append(kwargs) or generate_all(*args, **kwargs))
+
+    config = MockConfig(latency=0.01, throttle_rate=0.2, seed=0)
+    results = benchmark.main(["translation"], ["together"], 20, config, rate=0, max_retries=5)
+
+    assert [result["samples"] for result in results] == [20]
+    assert calls and calls[0]["max_retries"] == 5
+    assert results[0]["latency_p50"] > 0
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import itertools
+import pytest
+from cache import CacheMiss, ResponseCache
+from utils import cached_call
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A strictly increasing clock, so access order never ties
+    ticks = itertools.count()
+    monkeypatch.setattr("cache.time.time", lambda: float(next(ticks)))
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_size=10)
+    cache.put("a", "xxxx")
+    cache.put("b", "yyyy")
+    assert cache.get("a") == "xxxx"
+    cache.put("c", "zzzz")
+    assert cache.get("b") is None
+    assert cache.get("a") == "xxxx" and cache.get("c") == "zzzz"
+    assert cache.stats()["size"] == 8
+
+def test_key_depends_on_the_whole_request():
+    key = ResponseCache.make_key("together", "m", "p", "x", {"max_tokens": 8})
+    assert key == ResponseCache.make_key("together", "m", "p", "x", {"max_tokens": 8})
+    assert key != ResponseCache.make_key("together", "m", "p", "x", {"max_tokens": 9})
+    assert key != ResponseCache.make_key("cohere", "m", "p", "x", {"max_tokens": 8})
+
+def test_replay_serves_hits_and_raises_on_misses(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    calls = []
+    call = lambda: calls.append(1) or ("answer", {})
+    assert cached_call(cache, None, "together", "m", "p", "x", call) == "answer"
+    cache.close()
+
+    replay = ResponseCache(path, replay=True)
+    assert cached_call(replay, None, "together", "m", "p", "x", call) == "answer"
+    with pytest.raises(CacheMiss):
+        cached_call(replay, None, "together", "m", "p", "y", call)
+    assert calls == [1]
+    assert replay.stats()["hits"] == 1 and replay.stats()["misses"] == 1
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+from checkpoint import CheckpointLog
+from tasks import run_task
+
+def test_header_is_written_first(echo_task, tmp_path):
+    path = tmp_path / "run.jsonl"
+    run_task(echo_task, "together", None, "model-a", ["x", "y"], checkpoint=CheckpointLog(str(path)))
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert lines[0]["run"]["model"] == "model-a"
+    assert lines[0]["run"]["rows"] == 2
+    assert all("index" in line for line in lines[1:])
+
+def test_resume_same_run_reuses_responses(echo_task, tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    run_task(echo_task, "together", None, "model-a", ["x", "y"], checkpoint=CheckpointLog(path))
+    checkpoint = CheckpointLog(path, resume=True)
+    assert checkpoint.responses() == {0: "model-a:x", 1: "model-a:y"}
+    run_task(echo_task, "together", None, "model-a", ["x", "y"], checkpoint=checkpoint)
+
+@pytest.mark.parametrize("model_name, test_data", [("model-b", ["x", "y"]), ("model-a", ["x"])])
+def test_resume_other_run_is_refused(echo_task, tmp_path, model_name, test_data):
+    path = str(tmp_path / "run.jsonl")
+    run_task(echo_task, "together", None, "model-a", ["x", "y"], checkpoint=CheckpointLog(path))
+    with pytest.raises(ValueError, match="different run"):
+        run_task(echo_task, "together", None, model_name, test_data, checkpoint=CheckpointLog(path, resume=True))
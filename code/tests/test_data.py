@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+import pytest
+from data import LazyColumn, load_split
+
+datasets = pytest.importorskip("datasets")
+
+def test_load_split_from_disk_with_limit(tmp_path):
+    splits = datasets.DatasetDict({"test": datasets.Dataset.from_dict({"text": ["a", "b", "c"]})})
+    splits.save_to_disk(str(tmp_path))
+    test_data = load_split(str(tmp_path), split="test", limit=2)
+    assert test_data["text"] == ["a", "b"]
+
+def test_lazy_column_combines_columns():
+    test_data = datasets.Dataset.from_dict({"context": ["c1", "c2", "c3"], "question": ["q1", "q2", "q3"]})
+    column = LazyColumn(test_data, ["context", "question"], transform=lambda c, q: f"{c}|{q}", batch_size=2)
+    assert len(column) == 3
+    assert list(column) == ["c1|q1", "c2|q2", "c3|q3"]
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+from local_model import LocalBackend
+
+def test_stats_do_not_load_the_model():
+    backend = LocalBackend()
+    assert backend.stats("not/loaded") is None
+    assert backend.models == {}
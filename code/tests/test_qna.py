@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+import QnA_evaluation_BanglaRQA as qna
+from checkpoint import CheckpointLog
+
+def answer(number, text):
+    return {"question_number": number, "answerable": True, "question_type": "single-span", "answer": text}
+
+def test_packed_answers_follow_question_numbers():
+    response = "Here you go:\n" + json.dumps([answer(2, "খ"), answer(1, "ক")], ensure_ascii=False)
+    answers = qna.extract_json_array(response, 3)
+    assert [json.loads(a)["answer"] if a else None for a in answers] == ["ক", "খ", None]
+
+def test_unparsable_packed_response_falls_back():
+    assert qna.extract_json_array("[{\"answerable\": true,", 2) == [None, None]
+    assert qna.extract_json_array(json.dumps([{"answer": "x"}]), 1) == [None]
+
+@pytest.fixture
+def test_data():
+    datasets = pytest.importorskip("datasets")
+    return datasets.Dataset.from_dict({"context": ["c1", "c1", "c2"], "question_text": ["q1", "q2", "q3"]})
+
+def fake_generate_all(fail_after=None):
+    """Answer only the first question of each packed request, and single requests with "single"; optionally crash."""
+    def generate_all(service_choice, client, instruct_prompt, inputs, model_name, checkpoint=None, **kwargs):
+        responses = []
+        for position, input_text in enumerate(inputs):
+            if fail_after is not None and position == fail_after:
+                raise KeyboardInterrupt
+            if instruct_prompt == qna.llama3system_packed:
+                response = json.dumps([answer(1, input_text.split("1. ")[-1].split("\n")[0])])
+            else:
+                response = json.dumps(answer(1, "single"))
+            checkpoint.record(position, response=response)
+            responses.append(response)
+        return responses
+    return generate_all
+
+def test_packed_generation_falls_back_for_missing_answers(monkeypatch, test_data):
+    monkeypatch.setattr(qna, "generate_all", fake_generate_all())
+    responses = qna.QnATask(pack_contexts=True).generate("together", None, "m", test_data)
+    assert [json.loads(response)["answer"] for response in responses] == ["q1", "single", "q3"]
+
+def test_packed_answers_are_checkpointed_as_they_arrive(monkeypatch, tmp_path, test_data):
+    path = str(tmp_path / "run.jsonl")
+    monkeypatch.setattr(qna, "generate_all", fake_generate_all(fail_after=1))
+    with pytest.raises(KeyboardInterrupt):
+        qna.QnATask(pack_contexts=True).generate("together", None, "m", test_data, checkpoint=CheckpointLog(path))
+    assert list(CheckpointLog(path, resume=True).responses()) == [0]
+
+    monkeypatch.setattr(qna, "generate_all", fake_generate_all())
+    checkpoint = CheckpointLog(path, resume=True)
+    responses = qna.QnATask(pack_contexts=True).generate("together", None, "m", test_data, checkpoint=checkpoint)
+    # The second question of c1 is asked again, packed on its own
+    assert [json.loads(response)["answer"] for response in responses] == ["q1", "q2", "q3"]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from results import ResultsStore
+from tasks import run_task
+
+def test_leaderboard_metric_ignores_case(echo_task, tmp_path):
+    store = ResultsStore(str(tmp_path))
+    run_task(echo_task, "together", None, "model-a", ["x", "yy"], results=store)
+    assert store.leaderboard() == {("echo", "model-a"): 0.5}
+    assert store.leaderboard("accuracy") == {("echo", "model-a"): 0.5}
+    assert store.leaderboard("ACCURACY") == {("echo", "model-a"): 0.5}
+    assert store.leaderboard("chrF") == {("echo", "model-a"): None}
+
+def fixed_scorer(echo_task, rows):
+    """The echo task after a "scorer fix": every response now scores 1, and the split can be reloaded."""
+    datasets = pytest.importorskip("datasets")
+
+    class FixedEchoTask(type(echo_task)):
+        def load(self, model_name, dataset_range=None):
+            return datasets.Dataset.from_dict({"text": rows[:dataset_range]})
+
+        def score(self, test_data, responses):
+            return {"accuracy": 1.0}, {"parsed": list(responses), "score": [1.0] * len(responses)}
+
+    return FixedEchoTask()
+
+def test_rescore_keeps_scores_and_metrics_in_step(echo_task, tmp_path):
+    store = ResultsStore(str(tmp_path))
+    run_task(echo_task, "together", None, "model-a", ["x", "yy"], results=store)
+    task = fixed_scorer(echo_task, ["x", "yy"])
+
+    with pytest.raises(ValueError, match="score"):
+        store.rescore(task, ["parsed"])
+    assert store.leaderboard() == store.leaderboard("accuracy") == {("echo", "model-a"): 0.5}
+
+    store.rescore(task, ["score"])
+    assert store.leaderboard() == store.leaderboard("accuracy") == {("echo", "model-a"): 1.0}
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from telemetry import Telemetry
+from utils import cached_call, generate_all_async
+
+def fake_generate(calls, failures=0):
+    """A generate_fn whose first `failures` calls per input drop the connection."""
+    def generate(client, instruct_prompt, input_text, model_name, cache=None, telemetry=None, profile=None,
+                 stream=False, retries=0):
+        calls.append(input_text)
+        def call():
+            if calls.count(input_text) <= failures:
+                raise ConnectionError("dropped")
+            return input_text.upper(), {}
+        return cached_call(cache, telemetry, "together", model_name, instruct_prompt, input_text, call, retries=retries)
+    return generate
+
+def test_retries_count_each_retried_call_once(monkeypatch):
+    monkeypatch.setattr("scheduler.retry_delay", lambda error, attempt: 0)
+    telemetry = Telemetry()
+    responses = asyncio.run(generate_all_async(fake_generate([], failures=3), None, "p", ["a"], "m",
+                                               telemetry=telemetry, max_retries=5))
+    assert responses == ["A"]
+    entry = telemetry.summary()[0]
+    assert entry["requests"] == 4 and entry["errors"] == 3 and entry["retries"] == 3
+
+def test_lists_go_longest_first():
+    calls = []
+    asyncio.run(generate_all_async(fake_generate(calls), None, "p", ["a", "ccc", "bb"], "m", concurrency=1))
+    assert calls == ["ccc", "bb", "a"]
+
+def test_iterables_are_streamed_in_order():
+    consumed, seen = [], []
+    def inputs():
+        for text in ["a", "ccc", "bb"]:
+            consumed.append(text)
+            yield text
+    calls = []
+    generate = fake_generate(calls)
+    def tracking(*args, **kwargs):
+        seen.append(len(consumed))
+        return generate(*args, **kwargs)
+    responses = asyncio.run(generate_all_async(tracking, None, "p", inputs(), "m", concurrency=1))
+    assert responses == ["A", "CCC", "BB"]
+    assert calls == ["a", "ccc", "bb"]
+    assert seen == [1, 2, 3]
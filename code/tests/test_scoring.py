@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import inspect
+import pytest
+import scoring
+
+PREDICTIONS = ["আমি ভাত খাই।", "সে স্কুলে যায়", "the cat sat on the mat", "", "আজ আবহাওয়া খুব ভালো"]
+REFERENCES = ["আমি ভাত খাই।", "সে বিদ্যালয়ে যায়", "the cat is on the mat", "কিছু না", "আজকের আবহাওয়া ভালো"]
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_translations_match_sacrebleu(monkeypatch, parallel):
+    sacrebleu = pytest.importorskip("sacrebleu")
+    from utils import calculate_sacrebleu
+    if parallel:
+        monkeypatch.setattr(scoring, "MIN_PARALLEL_SIZE", 1)
+    scores = scoring.score_translations(PREDICTIONS, REFERENCES, processes=2 if parallel else 1)
+
+    sentence_bleu = [calculate_sacrebleu(reference, prediction) for prediction, reference in zip(PREDICTIONS, REFERENCES)]
+    assert scores["corpus_bleu"] == pytest.approx(sacrebleu.corpus_bleu(PREDICTIONS, [REFERENCES]).score)
+    assert scores["chrf++"] == pytest.approx(sacrebleu.corpus_chrf(PREDICTIONS, [REFERENCES], word_order=2).score)
+    assert scores["sentence_bleu"] == pytest.approx(sentence_bleu)
+    assert scores["mean_sentence_bleu"] == pytest.approx(sum(sentence_bleu) / len(sentence_bleu))
+
+def test_translations_need_one_reference_per_prediction():
+    with pytest.raises(ValueError):
+        scoring.score_translations(PREDICTIONS, REFERENCES[:-1])
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_rouge2_matches_rouge_score(monkeypatch, parallel):
+    rouge_scorer = pytest.importorskip("rouge_score.rouge_scorer")
+    if "lang" not in inspect.signature(rouge_scorer.RougeScorer).parameters:
+        pytest.skip("needs the multilingual rouge_score, which takes lang=")
+    if parallel:
+        monkeypatch.setattr(scoring, "MIN_PARALLEL_ROUGE_SIZE", 1)
+    concise = [prediction.split(" ")[0] for prediction in PREDICTIONS]
+    scores = scoring.score_rouge2(REFERENCES, processes=2 if parallel else 1, raw=PREDICTIONS, concise=concise)
+
+    scorer = rouge_scorer.RougeScorer(["rouge2"], use_stemmer=True, lang="bengali")
+    for name, candidates in [("raw", PREDICTIONS), ("concise", concise)]:
+        expected = [scorer.score(reference, candidate)["rouge2"].fmeasure
+                    for reference, candidate in zip(REFERENCES, candidates)]
+        assert scores[name] == pytest.approx(expected)
+
+# Expected values worked through the official SQuAD v2.0 evaluation script (evaluate's squad_v2)
+SQUAD_REFERENCES = [["The Cat", "a cat sat"], ["red apple pie"], [], [], ["42"], ["!!!"]]
+SQUAD_PREDICTIONS = ["cat.", "Apple tart", "", "something", "", ""]
+SQUAD_NO_ANSWER_PROBABILITIES = [0.1, 0.3, 0.9, 0.6, 0.8, 0.2]
+SQUAD_EXPECTED = {
+    "exact": 50.0, "f1": 100 * 3.4 / 6, "total": 6,
+    "HasAns_exact": 50.0, "HasAns_f1": 60.0, "HasAns_total": 4,
+    "NoAns_exact": 50.0, "NoAns_f1": 50.0, "NoAns_total": 2,
+    "best_exact": 100 * 4 / 6, "best_exact_thresh": 0.2,
+    "best_f1": 100 * 4.4 / 6, "best_f1_thresh": 0.3,
+}
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_squad_v2_matches_the_official_script(monkeypatch, parallel):
+    if parallel:
+        monkeypatch.setattr(scoring, "MIN_PARALLEL_SIZE", 1)
+    results = scoring.score_squad_v2(SQUAD_PREDICTIONS, SQUAD_REFERENCES, SQUAD_NO_ANSWER_PROBABILITIES,
+                                     processes=2 if parallel else 1)
+    # A gold answer that normalizes to nothing (as "!!!") counts as an empty answer, but the question stays HasAns
+    assert results.pop("exact_scores") == [1, 0, 1, 0, 0, 1]
+    assert results.pop("f1_scores") == pytest.approx([1, 0.4, 1, 0, 0, 1])
+    assert results == pytest.approx(SQUAD_EXPECTED)
+
+def test_squad_v2_without_no_answer_questions_has_no_noans_keys():
+    results = scoring.score_squad_v2(["x y"], [["y z"]])
+    assert results["f1"] == 50.0 and "NoAns_total" not in results
+    assert results["best_f1"] == 50.0 and results["best_f1_thresh"] == 0.0
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+import random
+import pytest
+from datasets import Dataset
+from sequential import normal_interval, bootstrap_interval, run_sequential
+from tasks import Task
+
+class NoisyTask(Task):
+    """Per-sample scores drawn around 50 on a 0-100 scale, like sentence BLEU."""
+
+    name = "noisy"
+    instruct_prompt = "p"
+
+    def generate(self, service_choice, client, model_name, test_data, **generation_kwargs):
+        return [str(value) for value in test_data["value"]]
+
+    def score(self, test_data, responses):
+        scores = [float(response) for response in responses]
+        return {"mean": sum(scores) / len(scores) if scores else 0.0}, {"score": scores}
+
+def split(size, seed=0):
+    rng = random.Random(seed)
+    return Dataset.from_dict({"value": [min(100.0, max(0.0, rng.gauss(50, 20))) for _ in range(size)]})
+
+def test_reported_interval_matches_stop_reason():
+    result = run_sequential(NoisyTask(), "together", None, "m", split(5000), target_half_width=2.0,
+                            batch_size=50, min_samples=100)
+    assert result["stop_reason"] == "target_half_width"
+    assert result["samples"] < 5000
+    assert (result["ci_high"] - result["ci_low"]) / 2 <= 2.0
+    assert "bootstrap_ci_low" in result
+
+def test_empty_split():
+    assert normal_interval([]) == (float("-inf"), float("inf"))
+    assert bootstrap_interval([]) == (float("-inf"), float("inf"))
+    with pytest.raises(ValueError, match="non-empty"):
+        run_sequential(NoisyTask(), "together", None, "m", split(0), target_half_width=2.0)
+
+class RepeatTask(Task):
+    """Generates through the normal dispatch (Task.generate -> utils.generate_all); the mock server echoes the input."""
+
+    name = "repeat"
+    instruct_prompt = "Repeat the input."
+
+    def load(self, model_name, dataset_range=None):
+        return Dataset.from_dict({"text": [f"sentence {i}" for i in range(dataset_range or 12)]})
+
+    def inputs(self, test_data):
+        return test_data["text"]
+
+    def score(self, test_data, responses):
+        scores = [float(response == text) for text, response in zip(test_data["text"], responses)]
+        return {"accuracy": sum(scores) / len(scores)}, {"score": scores}
+
+def test_sequential_from_the_command_line(monkeypatch, tmp_path):
+    # Regression: the default generation options used to pass shard=None down to generate_all
+    import argparse
+    import tasks
+    from mock_server import MockConfig, base_urls, start_mock_server
+    from sequential import add_sequential_args, sequential_options
+    from utils import add_generation_args, create_client, generation_options
+    pytest.importorskip("together")
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("api_key")
+    add_generation_args(parser)
+    add_sequential_args(parser)
+    args = parser.parse_args(["key", "--sequential", "--min-samples", "4", "--check-every", "4",
+                              "--target-half-width", "0.5", "--rate", "0", "--results", str(tmp_path)])
+
+    server, url = start_mock_server(MockConfig(latency=0.0))
+    monkeypatch.setattr(tasks, "create_client", lambda service, api_key: create_client(service, api_key, base_urls(url)[service]))
+    try:
+        metrics = tasks.evaluate(RepeatTask(), args.api_key, "together", "model", sequential=sequential_options(args),
+                                 **generation_options(args))
+    finally:
+        server.shutdown()
+    assert metrics["metrics"]["accuracy"] == 1.0
+    assert metrics["stop_reason"] == "target_half_width" and metrics["samples"] < 12
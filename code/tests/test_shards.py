@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+import sys
+import pytest
+from shards import launch, run_shard, shard_indices
+from tasks import run_task
+
+# Exits with 1 for shard 1/N and 0 otherwise; the launcher appends "--shard i/N"
+FAIL_SHARD_1 = [sys.executable, "-c", "import sys; sys.exit(sys.argv[2].startswith('1/'))"]
+
+def test_shard_indices_cover_the_split():
+    assert [index for shard in range(3) for index in shard_indices(10, (shard, 3))] == list(range(10))
+
+def test_launch_reports_failed_shards():
+    assert launch(FAIL_SHARD_1, 3, workers=2, merge=False) == [0, 1, 0]
+
+def test_launch_counts_shards_that_cannot_start():
+    assert launch(["/nonexistent/python"], 2, merge=False) == [1, 1]
+
+def test_main_exits_with_1_when_a_shard_fails(monkeypatch):
+    import shards
+    monkeypatch.setattr(sys, "argv", ["shards.py", "--shards", "3", "--no-merge", "--", *FAIL_SHARD_1])
+    with pytest.raises(SystemExit) as exit_info:
+        shards.main()
+    assert exit_info.value.code == 1
+
+def test_merged_shards_equal_a_single_run(echo_task, tmp_path):
+    pytest.importorskip("pyarrow")
+    datasets = pytest.importorskip("datasets")
+    test_data = datasets.Dataset.from_dict({"text": ["a" * length for length in range(1, 12)]})
+    for shard in range(3):
+        run_shard(echo_task, "together", None, "model", test_data, shard=(shard, 3), directory=str(tmp_path))
+    merged = run_shard(echo_task, "together", None, "model", test_data, merge=3, directory=str(tmp_path))
+    assert merged == run_task(echo_task, "together", None, "model", test_data)
+
+def test_merge_refuses_another_split(echo_task, tmp_path):
+    pytest.importorskip("pyarrow")
+    datasets = pytest.importorskip("datasets")
+    test_data = datasets.Dataset.from_dict({"text": ["a" * length for length in range(1, 12)]})
+    for shard in range(2):
+        run_shard(echo_task, "together", None, "model", test_data, shard=(shard, 2), directory=str(tmp_path))
+    with pytest.raises(ValueError, match="dataset_range"):
+        run_shard(echo_task, "together", None, "model", test_data.select(range(5)), merge=2, directory=str(tmp_path))
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+import pytest
+from startup_check import DEFAULT_BUDGET_MS, SCRIPTS, check_script, import_times
+
+@pytest.fixture(scope="module")
+def baseline():
+    return set(import_times(["-c", "pass"])[0])
+
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_help_stays_within_budget(script, baseline):
+    elapsed, heavy, returncode = check_script(script, baseline)
+    assert returncode == 0
+    assert heavy == []
+    assert elapsed <= DEFAULT_BUDGET_MS
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from utils import extract_summary, first_sentence_end, read_stream
+
+def stream(chunks):
+    for chunk in chunks:
+        yield chunk, None
+
+def test_preamble_is_not_taken_for_the_summary():
+    chunks = ["Sure", "! Here is", " the summary:", "\n", "\nবাংলাদেশে ", "বৃষ্টি হয়েছে। ", "আরও ", "লেখা।", " শেষ"]
+    received = []
+    def pieces():
+        for piece in stream(chunks):
+            received.append(piece[0])
+            yield piece
+
+    text, usage = read_stream(pieces(), 0.0, first_sentence_end)
+    assert extract_summary(text) == "বাংলাদেশে বৃষ্টি হয়েছে।"
+    # The stream is closed once the second sentence has started, before the rest arrives
+    assert len(received) < len(chunks)
+
+def test_no_cut_before_blank_line():
+    assert first_sentence_end("Sure! Here is the summary:") is None
+    assert first_sentence_end("বাংলাদেশে বৃষ্টি হয়েছে। আরও") is None
+    assert first_sentence_end("Summary:\n\nবাংলাদেশে বৃষ্টি হয়েছে। আরও") == len("Summary:\n\nবাংলাদেশে বৃষ্টি হয়েছে।")
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import pytest
+from telemetry import Telemetry
+from utils import cached_call
+
+def test_fertility_ignores_prompt_overhead_and_english_completions():
+    telemetry = Telemetry()
+    long_instructions = "Summarize the following article in one sentence. " * 20
+    telemetry.record("together", "m", long_instructions + "আমি বাংলা", "আমার সোনার", prompt_tokens=500, completion_tokens=5)
+    telemetry.record("together", "m", "Translate.\n\nআমি", "I am here", prompt_tokens=10, completion_tokens=3)
+    entry = telemetry.summary()[0]
+    # Only the Bengali completion counts: 5 tokens over its 9 Bengali characters
+    assert entry["bengali_fertility"] == 5 / 9
+    assert "prompt_tokens_per_bengali_char" not in entry
+
+def test_non_streamed_calls_record_ttfb():
+    telemetry = Telemetry()
+    response = cached_call(None, telemetry, "together", "m", "p", "x",
+                           lambda: ("ok", {"prompt_tokens": 1, "completion_tokens": 1}))
+    assert response == "ok"
+    record = telemetry.records[0]
+    assert record["ttfb"] is not None and record["ttfb"] == record["latency"]
+
+def test_latency_is_one_prometheus_summary():
+    from telemetry import prometheus_text
+    telemetry = Telemetry()
+    for latency in (0.1, 0.2, 0.3):
+        telemetry.record("together", "m", "p", "ok", latency=latency)
+    telemetry.record("together", "m", "p", "ok", cached=True)
+    lines = prometheus_text(telemetry.summary()).splitlines()
+    family = [line for line in lines if "banglabench_request_latency_seconds" in line]
+    assert [line for line in family if line.startswith("# TYPE")] == ["# TYPE banglabench_request_latency_seconds summary"]
+    samples = dict(line.rsplit(" ", 1) for line in family if not line.startswith("#"))
+    labels = 'task="",service="together",model="m"'
+    assert float(samples[f"banglabench_request_latency_seconds_sum{{{labels}}}"]) == pytest.approx(0.6)
+    assert samples[f"banglabench_request_latency_seconds_count{{{labels}}}"] == "3"
+    assert f'banglabench_request_latency_seconds{{{labels},quantile="0.5"}}' in samples
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+from data import LazyColumn
+from tasks import Task
+
+datasets = pytest.importorskip("datasets")
+token_index = pytest.importorskip("token_index")
+
+class WhitespaceTokenizer:
+    """One token per word, plus one special token in front when asked for."""
+
+    def __call__(self, texts, add_special_tokens=True):
+        count = lambda text: len(text.split()) + int(add_special_tokens)
+        if isinstance(texts, str):
+            return {"input_ids": [0] * count(texts)}
+        return {"input_ids": [[0] * count(text) for text in texts]}
+
+class SummaryTask(Task):
+    name = "summary"
+    instruct_prompt = "Summarize in Bengali."
+    dataset = ("articles", None, "test")
+    reference_column = "summary"
+    truncation_column = "text"
+
+    def inputs(self, test_data):
+        return LazyColumn(test_data, "text")
+
+SPLIT = {"text": ["one two three", "four five", "six seven eight nine ten"], "summary": ["a", "b c", "d e f"]}
+
+@pytest.fixture
+def build(monkeypatch, tmp_path):
+    monkeypatch.setattr(token_index, "load_tokenizer", lambda name: (WhitespaceTokenizer(), name))
+    monkeypatch.setattr(token_index, "load_split", lambda *args, **kwargs: datasets.Dataset.from_dict(SPLIT))
+    counted = []
+    count_tokens = token_index.count_tokens
+    monkeypatch.setattr(token_index, "count_tokens", lambda *args, **kwargs: counted.append(args[2]) or count_tokens(*args, **kwargs))
+    def build(**kwargs):
+        return token_index.build_index("whitespace", [SummaryTask()], num_proc=1, cache_dir=str(tmp_path), **kwargs)
+    build.counted = counted
+    build.cache_dir = str(tmp_path)
+    return build
+
+def test_build_and_open(build):
+    build()
+    index = token_index.TokenIndex.open("whitespace", build.cache_dir)
+    assert index.resolved_tokenizer == "whitespace"
+    arrays = index.task("summary")
+    # Instruct prompt (3 words) and input, joined by a blank line, without special tokens
+    assert arrays["prompt_tokens"].tolist() == [6, 5, 8]
+    assert arrays["reference_tokens"].tolist() == [1, 2, 3]
+    assert index.column("articles", None, "test", "text").tolist() == [4, 3, 6]
+    assert index.task("other") is None
+
+def test_up_to_date_entries_are_not_recounted(build):
+    build()
+    assert len(build.counted) == 3
+    build()
+    assert len(build.counted) == 3
+    build(rebuild=True)
+    assert len(build.counted) == 6
+
+def test_estimate_applies_range_truncation_and_prices(build):
+    index = build()
+    result = token_index.estimate(index, SummaryTask(), dataset_range=2, upper_limit=3, model_name="m",
+                                  prices={"m": {"input": 1e6, "output": 2e6}})
+    # Row 0 has one article token over the limit of 3
+    assert result["rows"] == 2 and result["prompt_tokens"] == 6 - 1 + 5
+    assert result["completion_tokens"] == 3
+    assert result["prompt_cost"] == 10 and result["completion_cost"] == 6
+
+def test_other_index_versions_are_ignored(build):
+    build()
+    path = f"{token_index.index_dir('whitespace', build.cache_dir)}/index.json"
+    with open(path, encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["version"] = token_index.TOKEN_INDEX_VERSION + 1
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    assert token_index.TokenIndex.open("whitespace", build.cache_dir).task("summary") is None
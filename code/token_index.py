@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed per-tokenizer token counts for every task prompt, reference and truncated column
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+from data import load_split
+from preprocessing import CACHE_DIR, load_tokenizer
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Bump when the way tokens are counted changes so stale indexes are rebuilt
+TOKEN_INDEX_VERSION = 1
+
+def index_dir(tokenizer_name, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, "token_index", re.sub(r"[^\w.-]+", "_", tokenizer_name))
+
+def count_batch(batch, tokenizer, columns, transform=None, instruct_prompt=None, add_special_tokens=False):
+    """Token count of each row's text, built from `columns` like LazyColumn and prefixed with the instruct prompt."""
+    texts = []
+    for values in zip(*(batch[column] for column in columns)):
+        text = transform(*values) if transform is not None else values[0]
+        texts.append(instruct_prompt + "\n\n" + text if instruct_prompt is not None else text)
+    encodings = tokenizer(texts, add_special_tokens=add_special_tokens)
+    return {"tokens": [len(input_ids) for input_ids in encodings["input_ids"]]}
+
+def count_tokens(dataset, tokenizer, columns, transform=None, instruct_prompt=None, add_special_tokens=False, num_proc=None):
+    import numpy as np
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    counts = dataset.map(
+        count_batch,
+        batched=True,
+        num_proc=num_proc or os.cpu_count(),
+        remove_columns=dataset.column_names,
+        fn_kwargs={"tokenizer": tokenizer, "columns": columns, "transform": transform,
+                   "instruct_prompt": instruct_prompt, "add_special_tokens": add_special_tokens},
+        desc="Counting tokens",
+    )
+    return np.asarray(counts["tokens"], dtype=np.uint32)
+
+class TokenIndex:
+    """Token counts for one tokenizer, stored as one memory-mapped uint32 .npy array per column.
+
+    Task entries hold `prompt_tokens` (the instruct prompt, a blank line and the formatted
+    input, as sent to Cohere; chat templates add a few tokens per request on Together) and
+    `reference_tokens`. Column entries hold the counts of a raw dataset column with special
+    tokens, as used for truncation.
+    """
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+
+    @classmethod
+    def open(cls, tokenizer_name, cache_dir=CACHE_DIR):
+        directory = index_dir(tokenizer_name, cache_dir)
+        path = os.path.join(directory, "index.json")
+        meta = {"tokenizer": tokenizer_name, "resolved_tokenizer": None, "version": TOKEN_INDEX_VERSION, "entries": {}}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+            if stored.get("version") == TOKEN_INDEX_VERSION:
+                meta = stored
+        return cls(directory, meta)
+
+    @property
+    def resolved_tokenizer(self):
+        return self.meta["resolved_tokenizer"]
+
+    def arrays(self, key):
+        import numpy as np
+        entry = self.meta["entries"].get(key)
+        if entry is None:
+            return None
+        return {name: np.load(os.path.join(self.directory, file), mmap_mode="r") for name, file in entry["arrays"].items()}
+
+    def task(self, task_name):
+        return self.arrays(f"task/{task_name}")
+
+    def column(self, path, name, split, column):
+        arrays = self.arrays(f"column/{path}/{name}/{split}/{column}")
+        return arrays["tokens"] if arrays is not None else None
+
+    def put(self, key, fingerprint, arrays, **info):
+        import numpy as np
+        os.makedirs(self.directory, exist_ok=True)
+        files = {}
+        for name, values in arrays.items():
+            file = hashlib.sha256(f"{key}/{name}".encode("utf-8")).hexdigest()[:16] + ".npy"
+            np.save(os.path.join(self.directory, file + ".tmp.npy"), values)
+            os.replace(os.path.join(self.directory, file + ".tmp.npy"), os.path.join(self.directory, file))
+            files[name] = file
+        self.meta["entries"][key] = {"fingerprint": fingerprint, "arrays": files, **info}
+        self.save()
+
+    def save(self):
+        path = os.path.join(self.directory, "index.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
+
+    def fresh(self, key, fingerprint):
+        entry = self.meta["entries"].get(key)
+        return entry is not None and entry["fingerprint"] == fingerprint
+
+def fingerprint(*parts):
+    return hashlib.sha256(json.dumps([TOKEN_INDEX_VERSION, *parts], ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+def build_index(tokenizer_name, tasks, num_proc=None, rebuild=False, cache_dir=CACHE_DIR):
+    """Count the tokens of every task's test split with one tokenizer, skipping entries that are up to date."""
+    tokenizer, resolved = load_tokenizer(tokenizer_name)
+    index = TokenIndex.open(tokenizer_name, cache_dir)
+    if index.resolved_tokenizer not in (None, resolved):
+        index.meta["entries"] = {}
+    index.meta["resolved_tokenizer"] = resolved
+
+    for task in tasks:
+        path, name, split = task.dataset
+        dataset = load_split(path, name, split=split)
+        inputs = task.inputs(dataset)
+        # The first formatted input stands in for the template, so template changes rebuild the entry
+        task_fingerprint = fingerprint(task.dataset, task.instruct_prompt, task.reference_column, next(iter(inputs), None))
+        key = f"task/{task.name}"
+        if rebuild or not index.fresh(key, task_fingerprint):
+            arrays = {"prompt_tokens": count_tokens(dataset, tokenizer, inputs.columns, inputs.transform,
+                                                    task.instruct_prompt, num_proc=num_proc)}
+            if task.reference_column:
+                arrays["reference_tokens"] = count_tokens(dataset, tokenizer, [task.reference_column], num_proc=num_proc)
+            instruct_tokens = len(tokenizer(task.instruct_prompt, add_special_tokens=False)["input_ids"])
+            index.put(key, task_fingerprint, arrays, dataset=list(task.dataset), rows=len(dataset), instruct_tokens=instruct_tokens)
+            logging.info(f"Indexed {len(dataset)} prompts of task '{task.name}' with tokenizer '{resolved}'.")
+
+        if task.truncation_column:
+            key = f"column/{path}/{name}/{split}/{task.truncation_column}"
+            column_fingerprint = fingerprint(task.dataset, task.truncation_column)
+            if rebuild or not index.fresh(key, column_fingerprint):
+                counts = count_tokens(dataset, tokenizer, [task.truncation_column], add_special_tokens=True, num_proc=num_proc)
+                index.put(key, column_fingerprint, {"tokens": counts}, rows=len(dataset))
+                logging.info(f"Indexed column '{task.truncation_column}' of {path} {split} with tokenizer '{resolved}'.")
+    return index
+
+def estimate(index, task, dataset_range=None, upper_limit=None, model_name=None, prices=None):
+    """Token totals and, with `prices` (dollars per million tokens per model), the cost of running `task`."""
+    import numpy as np
+    arrays = index.task(task.name)
+    if arrays is None:
+        raise KeyError(f"Task '{task.name}' is not in the token index for '{index.meta['tokenizer']}'")
+    rows = slice(0, dataset_range) if dataset_range else slice(None)
+    prompt_tokens = np.asarray(arrays["prompt_tokens"][rows], dtype=np.int64)
+    if task.truncation_column and upper_limit:
+        path, name, split = task.dataset
+        column = index.column(path, name, split, task.truncation_column)
+        if column is not None:
+            prompt_tokens = prompt_tokens - np.maximum(0, np.asarray(column[rows], dtype=np.int64) - upper_limit)
+    completion_tokens = int(arrays["reference_tokens"][rows].sum()) if "reference_tokens" in arrays else None
+
+    result = {
+        "task": task.name,
+        "tokenizer": index.resolved_tokenizer,
+        "rows": len(prompt_tokens),
+        "prompt_tokens": int(prompt_tokens.sum()),
+        "prompt_tokens_mean": float(prompt_tokens.mean()) if len(prompt_tokens) else None,
+        "prompt_tokens_p99": float(np.percentile(prompt_tokens, 99)) if len(prompt_tokens) else None,
+        "prompt_tokens_max": int(prompt_tokens.max()) if len(prompt_tokens) else None,
+        # References approximate the completion length
+        "completion_tokens": completion_tokens,
+    }
+    price = (prices or {}).get(model_name)
+    if price is not None:
+        result["prompt_cost"] = result["prompt_tokens"] * price.get("input", 0) / 1e6
+        result["completion_cost"] = completion_tokens * price.get("output", 0) / 1e6 if completion_tokens is not None else None
+    return result
+
+def load_prices(path):
+    if not path:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def main():
+    from tasks import load_all_tasks
+
+    parser = argparse.ArgumentParser(description="Build and query per-tokenizer token counts of the BanglaBench tasks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Count tokens for every task with each tokenizer")
+    build_parser.add_argument("--tokenizers", nargs="+", required=True, help="Tokenizer or model names; Cohere models fall back to the default tokenizer")
+    build_parser.add_argument("--tasks", nargs="+", default=None, help="Tasks to index (default: all)")
+    build_parser.add_argument("--num-proc", type=int, default=None, help="Tokenization processes (default: all CPUs)")
+    build_parser.add_argument("--rebuild", action="store_true", help="Recount entries that are already up to date")
+
+    query_parser = subparsers.add_parser("query", help="Tokens and cost of a task for one tokenizer")
+    query_parser.add_argument("--tokenizer", required=True, help="Tokenizer or model name the index was built for")
+    query_parser.add_argument("--task", required=True, help="Task name")
+    query_parser.add_argument("--dataset-range", type=int, default=None, help="Only count the first N rows")
+    query_parser.add_argument("--upper-limit", type=int, default=None, help="Apply article truncation to this many tokens")
+    query_parser.add_argument("--model", type=str, default=None, help="Model name to look up in --prices (default: the tokenizer)")
+    query_parser.add_argument("--prices", type=str, default=None, help="JSON file mapping model names to input/output dollars per million tokens")
+
+    args = parser.parse_args()
+    tasks = load_all_tasks()
+    if args.command == "build":
+        selected = [tasks[name] for name in args.tasks] if args.tasks else list(tasks.values())
+        for tokenizer_name in args.tokenizers:
+            build_index(tokenizer_name, selected, num_proc=args.num_proc, rebuild=args.rebuild)
+    elif args.command == "query":
+        index = TokenIndex.open(args.tokenizer)
+        result = estimate(index, tasks[args.task], args.dataset_range, args.upper_limit,
+                          args.model or args.tokenizer, load_prices(args.prices))
+        print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,445 @@
-import sacrebleu
+import asyncio
+import functools
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from shards import parse_shard
+
+# Requests kept in flight and requests per second allowed for each service
+DEFAULT_CONCURRENCY = {"together": 8, "cohere": 4, "local": 16}
+DEFAULT_RATE = {"together": 10.0, "cohere": 1.0, "local": 0}
+
+class GenerationProfile:
+    """Per-task generation settings.
+
+    `max_tokens` caps the output and `stop` lists stop sequences; both are sent to the
+    provider and are part of the cache key. `complete(text)` is used by streamed calls: it
+    returns the end of the useful output once it has arrived (e.g. after the verdict or
+    the closing brace of a JSON object) and None until then, so the stream can be closed
+    without waiting for the rest of the generation.
+    """
+
+    def __init__(self, max_tokens=None, stop=None, complete=None):
+        self.max_tokens = max_tokens
+        self.stop = stop
+        self.complete = complete
+
+    def params(self):
+        params = {}
+        if self.max_tokens is not None:
+            params["max_tokens"] = self.max_tokens
+        if self.stop:
+            params["stop"] = list(self.stop)
+        return params
+
+def request_params(profile, stream):
+    """Parameters that change a response, used in the cache key."""
+    params = profile.params() if profile is not None else {}
+    if stream and profile is not None and profile.complete is not None:
+        params["stream_until_complete"] = True
+    return params
+
+def cached_call(cache, telemetry, service, model_name, instruct_prompt, input_text, call, params=None, retries=0):
+    """Serve a request from `cache` or run `call`, which returns (text, usage), and record it in `telemetry`.
+
+    `retries` is 1 when the call repeats a failed attempt of the same request and 0 otherwise,
+    so that summing it over the recorded calls counts the retries.
+    """
+    key = cache.make_key(service, model_name, instruct_prompt, input_text, params) if cache is not None else None
+    prompt = instruct_prompt + "\n\n" + input_text
+    if cache is not None:
+        response = cache.get(key)
+        if response is not None:
+            if telemetry is not None:
+                telemetry.record(service, model_name, prompt, response, cached=True)
+            return response
+
+    start = time.perf_counter()
+    try:
+        response, usage = call()
+    except Exception as e:
+        if telemetry is not None:
+            telemetry.record(service, model_name, prompt, None, latency=time.perf_counter() - start,
+                             retries=retries, error=repr(e))
+        raise
+    latency = time.perf_counter() - start
+    if usage.get("ttfb") is None:
+        # Without streaming the first byte of the text arrives with the whole response
+        usage = {**usage, "ttfb": latency}
+    if telemetry is not None:
+        telemetry.record(service, model_name, prompt, response, latency=latency, retries=retries, **usage)
+    if cache is not None:
+        cache.put(key, response)
+    return response
+
+def read_stream(pieces, start, complete=None, close=None):
+    """Join the (text, usage) pieces of a streamed response, closing the stream as soon as `complete` finds the end.
+
+    Returns (text, usage) where usage also holds the time to the first text piece since `start`.
+    A stream closed early never reports usage, so its completion tokens are counted as the
+    number of pieces received (providers stream about one token per piece).
+    """
+    text, ttfb, received = "", None, 0
+    usage = {"prompt_tokens": None, "completion_tokens": None}
+    try:
+        for piece, piece_usage in pieces:
+            if piece_usage:
+                usage.update(piece_usage)
+            if not piece:
+                continue
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            text += piece
+            received += 1
+            end = complete(text) if complete is not None else None
+            if end is not None:
+                text = text[:end]
+                break
+    finally:
+        if close is not None:
+            close()
+    if usage["completion_tokens"] is None:
+        usage["completion_tokens"] = received
+    usage["ttfb"] = ttfb
+    return text, usage
+
+def together_pieces(stream):
+    for chunk in stream:
+        usage = getattr(chunk, "usage", None)
+        delta = chunk.choices[0].delta if chunk.choices else None
+        yield getattr(delta, "content", None), {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+        } if usage else None
+
+def cohere_pieces(stream):
+    for event in stream:
+        if event.event_type == "text-generation":
+            yield event.text, None
+        elif event.event_type == "stream-end":
+            billed_units = getattr(getattr(event.response, "meta", None), "billed_units", None)
+            yield None, {
+                "prompt_tokens": getattr(billed_units, "input_tokens", None),
+                "completion_tokens": getattr(billed_units, "output_tokens", None),
+            }
+
+def chat_together(client, instruct_prompt, input_text, model_name, profile=None, stream=False):
+    params = profile.params() if profile is not None else {}
+    messages = [
+        {"role": "system", "content": instruct_prompt},
+        {"role": "user", "content": input_text},
+    ]
+    if stream:
+        start = time.perf_counter()
+        response = client.chat.completions.create(messages=messages, model=model_name, stream=True, **params)
+        return read_stream(together_pieces(response), start, profile.complete if profile else None,
+                           getattr(response, "close", None))
 
-def generate_content_together(client, instruct_prompt, input_text, model_name):
     response = client.chat.completions.create(
-        messages=[
-            {"role": "system", "content": instruct_prompt},
-            {"role": "user", "content": input_text},
-        ],
-        model=model_name
+        messages=messages,
+        model=model_name,
+        **params
     )
-    return response.choices[0].message.content
+    usage = getattr(response, "usage", None)
+    return response.choices[0].message.content, {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+    }
+
+def chat_aya(client, instruct_prompt, input_text, model_name, profile=None, stream=False):
+    params = profile.params() if profile is not None else {}
+    if "stop" in params:
+        params["stop_sequences"] = params.pop("stop")
+    if stream:
+        start = time.perf_counter()
+        response = client.chat_stream(model=model_name, message=instruct_prompt + "\n\n" + input_text, **params)
+        return read_stream(cohere_pieces(response), start, profile.complete if profile else None,
+                           getattr(response, "close", None))
 
-def generate_content_aya(client, instruct_prompt, input_text, model_name):
     response = client.chat(
         model=model_name,
-        message= instruct_prompt+ "\n\n" + input_text
+        message= instruct_prompt+ "\n\n" + input_text,
+        **params
     )
-    return response.text
+    billed_units = getattr(getattr(response, "meta", None), "billed_units", None)
+    return response.text, {
+        "prompt_tokens": getattr(billed_units, "input_tokens", None),
+        "completion_tokens": getattr(billed_units, "output_tokens", None),
+    }
+
+def generate_content_together(client, instruct_prompt, input_text, model_name, cache=None, telemetry=None,
+                              profile=None, stream=False, retries=0):
+    call = lambda: chat_together(client, instruct_prompt, input_text, model_name, profile, stream)
+    return cached_call(cache, telemetry, "together", model_name, instruct_prompt, input_text, call,
+                       request_params(profile, stream), retries)
+
+def generate_content_aya(client, instruct_prompt, input_text, model_name, cache=None, telemetry=None,
+                         profile=None, stream=False, retries=0):
+    call = lambda: chat_aya(client, instruct_prompt, input_text, model_name, profile, stream)
+    return cached_call(cache, telemetry, "cohere", model_name, instruct_prompt, input_text, call,
+                       request_params(profile, stream), retries)
+
+def chat_local(client, instruct_prompt, input_text, model_name, profile=None, stream=False):
+    max_tokens = profile.max_tokens if profile is not None else None
+    stop = profile.stop if profile is not None else None
+    return client.generate(model_name, instruct_prompt, input_text, max_tokens, stop)
+
+def generate_content_local(client, instruct_prompt, input_text, model_name, cache=None, telemetry=None,
+                           profile=None, stream=False, retries=0):
+    call = lambda: chat_local(client, instruct_prompt, input_text, model_name, profile)
+    return cached_call(cache, telemetry, "local", model_name, instruct_prompt, input_text, call,
+                       request_params(profile, False), retries)
+
+GENERATORS = {
+    "together": generate_content_together,
+    "cohere": generate_content_aya,
+    "local": generate_content_local,
+}
+
+def create_client(service_choice, api_key, base_url=None):
+    """Create the SDK client for a service; `base_url` points it at another endpoint, e.g. mock_server.py.
+
+    SDK retries are turned off so that 429s reach the scheduler in `generate_all_async`,
+    which retries them itself. The `local` service needs no API key and loads Hugging Face
+    models on first use.
+    """
+    if service_choice == "together":
+        import os
+        from together import Together
+        os.environ["TOGETHER_API_KEY"] = api_key
+        if base_url:
+            return Together(api_key=api_key, base_url=base_url, max_retries=0)
+        return Together(api_key=api_key, max_retries=0)
+    elif service_choice == "cohere":
+        import cohere
+        if base_url:
+            return cohere.Client(api_key, base_url=base_url, max_retries=0)
+        return cohere.Client(api_key, max_retries=0)
+    elif service_choice == "local":
+        from local_model import LocalBackend
+        return LocalBackend()
+    raise ValueError(f"Unknown service choice: {service_choice}")
+
+class RateLimiter:
+    """Token bucket that lets `rate` requests per second through, with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+async def generate_all_async(generate_fn, client, instruct_prompt, inputs, model_name,
+                             concurrency=8, rate=None, cache=None, checkpoint=None, telemetry=None,
+                             profile=None, stream=False, budget=None, costs=None, max_retries=0,
+                             adaptive=True, desc="Generating"):
+    """Run `generate_fn` over `inputs` with up to `concurrency` requests in flight, returning responses in input order.
+
+    With a `checkpoint`, inputs whose response is already logged are skipped and every
+    new response is appended to the log as soon as it arrives. `profile` and `stream` are
+    passed on to `generate_fn`.
+
+    When `inputs` is a list or tuple, or `costs` (estimated tokens per input) were computed,
+    inputs are dispatched longest first, so the slowest requests do not trail at the end of
+    the run. Other iterables, such as a data.LazyColumn, are streamed in order without being
+    materialized. With a `budget`
+    (scheduler.MinuteBudget) every request is charged its cost before it is sent. Calls
+    that fail with a 429, a server error or a dropped connection are retried up to
+    `max_retries` times. With `adaptive`, concurrency drops on 429s and latency spikes and
+    climbs back to `concurrency` while requests succeed.
+    """
+    from tqdm import tqdm
+    from scheduler import AdaptiveConcurrency, is_rate_limited, is_retryable, retry_delay
+    limiter = RateLimiter(rate, burst=concurrency) if rate else None
+    slots = AdaptiveConcurrency(concurrency) if adaptive else None
+    generate_fn = functools.partial(generate_fn, cache=cache, telemetry=telemetry, profile=profile, stream=stream)
+    loop = asyncio.get_running_loop()
+    done = checkpoint.responses() if checkpoint is not None else {}
+    results = {}
+    try:
+        total = len(inputs)
+    except TypeError:
+        total = None
+    progress = tqdm(total=total, desc=desc)
+
+    def pending():
+        for i, input_text in enumerate(inputs):
+            if i in done:
+                results[i] = done[i]
+                progress.update(1)
+            else:
+                yield i, input_text
+
+    if costs is not None or isinstance(inputs, (list, tuple)):
+        items = iter(sorted(pending(), key=lambda item: costs[item[0]] if costs is not None else len(item[1]),
+                            reverse=True))
+    else:
+        items = pending()
+
+    async def call(executor, i, input_text):
+        for attempt in range(max_retries + 1):
+            if budget is not None:
+                await budget.acquire(costs[i] if costs is not None else 0)
+            if limiter is not None:
+                await limiter.acquire()
+            if slots is not None:
+                await slots.acquire()
+            start = time.monotonic()
+            try:
+                response = await loop.run_in_executor(
+                    executor, functools.partial(generate_fn, retries=int(attempt > 0)), client, instruct_prompt, input_text, model_name
+                )
+            except Exception as e:
+                throttled = is_rate_limited(e)
+                if slots is not None:
+                    await slots.release(throttled=throttled)
+                if attempt == max_retries or not is_retryable(e):
+                    raise
+                delay = retry_delay(e, attempt)
+                if throttled and budget is not None:
+                    budget.pause(delay)
+                logging.warning(f"Request {i} failed ({e!r}); retry {attempt + 1}/{max_retries} in {delay:.1f}s.")
+                await asyncio.sleep(delay)
+                continue
+            if slots is not None:
+                await slots.release(latency=time.monotonic() - start)
+            return response
+
+    async def worker(executor):
+        for i, input_text in items:
+            results[i] = await call(executor, i, input_text)
+            if checkpoint is not None:
+                checkpoint.record(i, response=results[i])
+            progress.update(1)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        await asyncio.gather(*(worker(executor) for _ in range(concurrency)))
+    progress.close()
+    return [results[i] for i in sorted(results)]
+
+def generate_all(service_choice, client, instruct_prompt, inputs, model_name,
+                 concurrency=None, rate=None, cache=None, checkpoint=None, telemetry=None,
+                 profile=None, stream=False, batch=None, rpm=None, tpm=None, max_retries=5, desc="Generating"):
+    """Generate a response per input; with `batch`, the options of `batch.generate_batch`, as one provider batch job.
+
+    `rpm` and `tpm` are the requests and tokens per minute allowed for the client's API key,
+    shared by every run in the process that uses it. With `tpm`, each request's tokens are
+    estimated with the model's tokenizer.
+    """
+    if batch is not None:
+        from batch import generate_batch
+        return generate_batch(service_choice, client, instruct_prompt, inputs, model_name, profile=profile, cache=cache,
+                              checkpoint=checkpoint, telemetry=telemetry, desc=desc, concurrency=concurrency,
+                              rate=rate, rpm=rpm, tpm=tpm, max_retries=max_retries, **batch)
+    from scheduler import estimate_tokens, get_budget
+    concurrency = concurrency or DEFAULT_CONCURRENCY[service_choice]
+    rate = rate if rate is not None else DEFAULT_RATE[service_choice]
+    local = service_choice == "local"
+    budget = get_budget(service_choice, client, rpm, tpm) if not local else None
+    costs = None
+    if tpm and not local:
+        costs = estimate_tokens(instruct_prompt, inputs, model_name, profile.max_tokens if profile is not None else None)
+        logging.info(f"Estimated {sum(costs)} tokens for {len(costs)} requests against a budget of {tpm} tokens per minute.")
+    responses = asyncio.run(generate_all_async(
+        GENERATORS[service_choice], client, instruct_prompt, inputs, model_name,
+        concurrency=concurrency, rate=rate, cache=cache, checkpoint=checkpoint, telemetry=telemetry,
+        profile=profile, stream=stream, budget=budget, costs=costs, max_retries=max_retries,
+        adaptive=not local, desc=desc
+    ))
+    if cache is not None:
+        logging.info(f"Response cache: {cache.stats()}")
+    if service_choice == "local" and (stats := client.stats(model_name)) is not None:
+        logging.info(f"Local generation: {stats}")
+    return responses
+
+def add_generation_args(parser, checkpoint=True):
+    parser.add_argument("--concurrency", type=int, default=None, help="Number of requests kept in flight (default depends on the service)")
+    parser.add_argument("--rate", type=float, default=None, help="Maximum requests per second, 0 to disable (default depends on the service)")
+    parser.add_argument("--cache", type=str, default=None, help="Path to a SQLite response cache shared across runs")
+    parser.add_argument("--cache-size", type=float, default=None, help="Maximum size of the response cache in MB")
+    parser.add_argument("--replay", action="store_true", help="Only serve responses from the cache and fail on a miss")
+    parser.add_argument("--rpm", type=int, default=None, help="Requests per minute allowed for the API key")
+    parser.add_argument("--tpm", type=int, default=None, help="Tokens per minute allowed for the API key; prompts are measured with the model's tokenizer")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries of a request after a 429, server error or dropped connection")
+    parser.add_argument("--stream", action="store_true", help="Stream responses and stop reading once the task's answer is complete")
+    parser.add_argument("--batch", action="store_true", help="Submit all prompts as one provider batch job (Together only) instead of live requests")
+    parser.add_argument("--batch-dir", type=str, default="batches", help="Directory for batch request files and job ids")
+    parser.add_argument("--poll-interval", type=float, default=30, help="Seconds between batch job status checks")
+    parser.add_argument("--results", type=str, default="results", help="Root of the Parquet store that per-sample results are written to ('' to disable)")
+    parser.add_argument("--shard", type=parse_shard, default=None, help="Only run shard i/N of the test split and write its partial results")
+    parser.add_argument("--merge-shards", type=int, default=None, metavar="N", help="Merge the partial results of N shards instead of generating")
+    parser.add_argument("--shard-dir", type=str, default="shards", help="Directory for the partial results of shards")
+    parser.add_argument("--telemetry", type=str, default=None, help="Write per-model request telemetry to <path>.json and <path>.prom")
+    parser.add_argument("--prices", type=str, default=None, help="JSON file mapping model names to input/output dollars per million tokens")
+    if checkpoint:
+        parser.add_argument("--checkpoint", type=str, default=None, help="Path to a JSONL log that every per-sample result is appended to")
+        parser.add_argument("--resume", action="store_true", help="Skip samples already completed in the --checkpoint log")
+
+def generation_options(args):
+    """Collect the keyword arguments for `generate_all` from the options added by `add_generation_args`."""
+    from cache import open_cache
+    from checkpoint import open_checkpoint
+    from telemetry import open_telemetry
+    results = None
+    if args.results:
+        # The results store writes with pyarrow, so it is only imported when results are kept
+        from results import open_results
+        results = open_results(args)
+    options = {
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "rpm": args.rpm,
+        "tpm": args.tpm,
+        "max_retries": args.max_retries,
+        "cache": open_cache(args),
+        "telemetry": open_telemetry(args),
+        "results": results,
+        "stream": args.stream,
+        "batch": {"directory": args.batch_dir, "poll_interval": args.poll_interval} if args.batch else None,
+        "shard": ({"shard": args.shard, "merge": args.merge_shards, "directory": args.shard_dir}
+                  if args.shard or args.merge_shards else None),
+    }
+    if hasattr(args, "checkpoint") and not args.merge_shards:
+        options["checkpoint"] = open_checkpoint(args)
+    return options
 
 def calculate_sacrebleu(reference_sentence, candidate_sentence):
+    import sacrebleu
     reference = [[reference_sentence]]
     candidate = [candidate_sentence]
     sbleu = sacrebleu.corpus_bleu(candidate, reference)
     return sbleu.score
 
+SENTENCE_END = re.compile(r"[।.!?]\s+(?=\S)")
+
+def first_sentence_end(text):
+    """End of the first sentence of the part `extract_summary` keeps, once the next sentence has started.
+
+    Until the blank line that closes a preamble ("Sure! Here is the summary:\n\n") has
+    arrived it is unknown which part will be kept, so nothing is cut before it; responses
+    without one run to the token cap.
+    """
+    start = text.find("\n\n")
+    if start == -1:
+        return None
+    match = SENTENCE_END.search(text, start + 2)
+    return match.start() + 1 if match else None
+
 def extract_summary(input_text):
   if "\n\n" in input_text:
     return input_text.split("\n\n")[1]
   else:
-    return input_text
\ No newline at end of file
+    return input_text